@@ -0,0 +1,241 @@
+import asyncio
+
+from config_loader import config, load_sources
+from log_monitor import LogMonitor, apply_config
+from event_batcher import EventBatcher
+from file_watcher import create_watcher
+from metrics import metrics
+from scheduler import Backoff
+from supervisor import SupervisorGroup
+
+
+_errors = metrics.counter('errors_total', "按类型统计的异常次数", label='type')
+
+
+class AsyncMonitor:
+    """
+    asyncio 监控核心 - 进程等待、日志查找、增量读取和匹配共用一个事件循环
+
+    可以运行在 qasync 桥接的 Qt 事件循环上，也可以用 asyncio.run() 无界面运行。
+    每个监控源一个读取协程和一个进程监督协程，没有阻塞等待的线程。
+    """
+
+    def __init__(self, sources=None, on_events=None, checkpoint_path=None):
+        """
+        Args:
+            sources: 监控源配置列表，默认 load_sources()
+            on_events: 回调 (list[ChannelEvent])，在事件循环中执行
+            checkpoint_path: 检查点文件路径，默认读取 monitor.checkpoint_path
+        """
+        sources = sources or load_sources()
+        self._on_events = on_events
+        self._watcher = create_watcher()
+        self._batcher = EventBatcher()
+        self._flush_handle = None
+        self._loop = None
+        self._task = None
+        self._monitors = {
+            source['name']: LogMonitor(None, source=source, watcher=self._watcher,
+                                       checkpoint_path=checkpoint_path)
+            for source in sources
+        }
+        self._wakeups = {}
+        self._supervisors = SupervisorGroup(
+            sources, on_start=self._on_process_start, on_exit=self._on_process_exit)
+
+    @property
+    def monitors(self):
+        return self._monitors
+
+    @property
+    def watcher(self):
+        """所有监控源共享的文件变更监视器"""
+        return self._watcher
+
+    def attach(self, name, pid, log_path):
+        """启动前已找到进程和日志的监控源直接开始监控"""
+        self._supervisors.supervisors[name].attach(pid, log_path)
+        self._monitors[name].resume(log_path)
+
+    def _wake(self, name=None):
+        for key, event in self._wakeups.items():
+            if name is None or key == name:
+                event.set()
+
+    def _on_process_start(self, name, pid, log_path):
+        # supervisor.step 在线程池中执行，状态变化转到事件循环中应用
+        self._loop.call_soon_threadsafe(self._resume, name, log_path)
+
+    def _on_process_exit(self, name):
+        self._loop.call_soon_threadsafe(self._pause, name)
+
+    def _resume(self, name, log_path):
+        self._monitors[name].resume(log_path)
+        self._wake(name)
+
+    def _pause(self, name):
+        self._monitors[name].pause()
+        self._wake(name)
+
+    def _flush(self):
+        self._flush_handle = None
+        if len(self._batcher):
+            batch = self._batcher.flush()
+            if self._on_events:
+                self._on_events(batch)
+
+    def _schedule_flush(self):
+        """批次到期立即交付，否则在到期时刻交付"""
+        remaining = self._batcher.remaining()
+        if remaining is None:
+            return
+        if remaining <= 0:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(remaining, self._flush)
+
+    def _on_config(self, snapshot):
+        """配置文件已重新加载（在重新加载的线程中调用），转到事件循环中应用"""
+        self._loop.call_soon_threadsafe(self._apply_config, snapshot)
+
+    def _apply_config(self, snapshot):
+        """热重载：更新匹配规则和时间参数，读取协程不重启"""
+        try:
+            apply_config(self._monitors, snapshot)
+        except Exception as e:
+            # 新配置无法应用时继续按当前配置监控
+            _errors.inc(label=type(e).__name__)
+            return
+        self._batcher.window = snapshot.get('monitor.batch_window', 0)
+        self._wake()
+
+    def _on_readable(self):
+        if self._watcher.read_events():
+            self._wake()
+
+    async def _poll_changes(self):
+        """不支持描述符监听时（轮询 / Windows 句柄），定期做一次非阻塞检查"""
+        interval = config.get('monitor.check_interval', 0.2)
+        while True:
+            await asyncio.sleep(interval)
+            if self._watcher.wait(0):
+                self._wake()
+
+    def _start_change_notifications(self):
+        """注册文件变更通知，返回需要额外运行的协程（没有则为 None）"""
+        if hasattr(self._watcher, 'fileno'):
+            try:
+                self._loop.add_reader(self._watcher.fileno(), self._on_readable)
+                return None
+            except NotImplementedError:
+                pass
+        return self._poll_changes()
+
+    async def _supervise(self, supervisor):
+        """
+        按 process.wait_interval 推进进程状态机
+
+        每一步都在线程池中执行：进程枚举和日志查找（扫描目录、检查备用路径）
+        都是阻塞 I/O，不能占用事件循环（qasync 下即界面线程）
+        """
+        interval = config.get('process.wait_interval', 2)
+        while True:
+            try:
+                await self._loop.run_in_executor(None, supervisor.step, False)
+            except Exception as e:
+                # 单次检查失败不结束协程，下一个间隔重试
+                _errors.inc(label=type(e).__name__)
+            await asyncio.sleep(interval)
+
+    async def _tail(self, monitor, wake):
+        """单个监控源的读取协程"""
+        idle = Backoff(config.get('monitor.watch_timeout', 2), config.get('monitor.idle_timeout_max', 30))
+        while True:
+            wake.clear()
+            if not monitor.active:
+                # 目标进程未运行：等待进程监督协程唤醒
+                await wake.wait()
+                continue
+
+            try:
+                self._batcher.add(monitor.poll())
+            except PermissionError as e:
+                _errors.inc(label=type(e).__name__)
+                await asyncio.sleep(0.5)
+                continue
+            except Exception as e:
+                _errors.inc(label=type(e).__name__)
+                await asyncio.sleep(3)
+                continue
+
+            if monitor.has_more:
+                # 让出事件循环，其他监控源和界面不被长时间阻塞
+                await asyncio.sleep(0)
+                continue
+            self._schedule_flush()
+            if monitor.check_newer_log():
+                continue
+            if not len(self._batcher):
+                monitor.save_checkpoint()
+
+            if self._watcher.retry_pending():
+                # 启动时不存在的日志目录已出现：唤醒所有读取协程立即重新读取
+                self._wake()
+            try:
+                if monitor.missing:
+                    # 日志文件不存在：已收集的事件不再等待批量窗口
+                    if self._flush_handle is not None:
+                        self._flush_handle.cancel()
+                    self._flush()
+                    timeout = config.get('monitor.file_wait_interval', 3)
+                else:
+                    idle.update(config.get('monitor.watch_timeout', 2),
+                                config.get('monitor.idle_timeout_max', 30))
+                    timeout = idle.next() if monitor.idle else idle.reset()
+                    checkpoint = monitor.checkpoint_remaining()
+                    if checkpoint is not None:
+                        timeout = min(timeout, checkpoint)
+                await asyncio.wait_for(wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """运行直到被取消（stop()）"""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._wakeups = {name: asyncio.Event() for name in self._monitors}
+
+        coroutines = [self._tail(monitor, self._wakeups[name])
+                      for name, monitor in self._monitors.items()]
+        coroutines += [self._supervise(supervisor)
+                       for supervisor in self._supervisors.supervisors.values()]
+        poller = self._start_change_notifications()
+        if poller is not None:
+            coroutines.append(poller)
+
+        tasks = [asyncio.ensure_future(coro) for coro in coroutines]
+        config.subscribe(self._on_config)
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            config.unsubscribe(self._on_config)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if poller is None:
+                self._loop.remove_reader(self._watcher.fileno())
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+            for monitor in self._monitors.values():
+                monitor.save_checkpoint(force=True)
+            self._watcher.close()
+
+    def stop(self):
+        """取消运行（线程安全）"""
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
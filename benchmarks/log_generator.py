@@ -0,0 +1,174 @@
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+
+NOISE_LINES = [
+    "[INFO] heartbeat ok, session keepalive sent to relay server",
+    "[DEBUG] rtp packet stats: recv=1532 lost=0 jitter=3ms bitrate=2048kbps",
+    "[INFO] P2P connection status check, nat type=3, relay=false",
+    "[DEBUG] video encoder queue depth=2, frame interval=40ms",
+]
+
+
+class SyntheticLog:
+    """
+    合成 ich_run 日志写入器
+
+    按给定的行速率、"Create Channel" 密度和突发程度写入日志，可选按行数轮转到
+    下一个编号文件，以及把一行拆成两次写入（模拟写到一半被读取）
+    """
+
+    def __init__(self, directory, start_number=1, create_ratio=0.01, end_ratio=0.01,
+                 burst=1, rotate_lines=0, partial_ratio=0.0, devices=50, seed=None):
+        """
+        Args:
+            directory: 日志目录
+            start_number: 第一个日志文件编号
+            create_ratio: 通道开始行占比
+            end_ratio: 通道结束行占比
+            burst: 每次连续写入的行数（突发程度）
+            rotate_lines: 每个文件的行数，0 表示不轮转
+            partial_ratio: 拆成两次写入的行占比
+            devices: 设备数量
+            seed: 随机种子，便于不同版本对比
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.number = start_number
+        self.create_ratio = create_ratio
+        self.end_ratio = end_ratio
+        self.burst = max(1, burst)
+        self.rotate_lines = rotate_lines
+        self.partial_ratio = partial_ratio
+        self.devices = devices
+        self.lines = 0
+        self.creates = 0
+        self._random = random.Random(seed)
+        self._open = []
+        self._file_lines = 0
+        self._file = None
+        self._open_file()
+
+    @property
+    def path(self):
+        return self.directory / f"ich_run_{self.number}.log"
+
+    def _open_file(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, 'ab', buffering=0)
+        self._file_lines = 0
+        self._open.clear()
+
+    def rotate(self):
+        """切换到下一个编号的日志文件"""
+        self.number += 1
+        self._open_file()
+
+    def create_line(self, cid=None, channel_id=None):
+        rnd = self._random
+        cid = cid if cid is not None else rnd.randrange(10 ** 8, 10 ** 9)
+        channel_id = channel_id if channel_id is not None else rnd.randrange(4)
+        self._open.append((cid, channel_id))
+        return f"Create Channel PeerCid is {cid}, ServiceID is 1, ChanId[{channel_id}]"
+
+    def next_line(self):
+        rnd = self._random
+        r = rnd.random()
+        if r < self.create_ratio:
+            self.creates += 1
+            text = self.create_line(10 ** 8 + rnd.randrange(self.devices))
+        elif r < self.create_ratio + self.end_ratio and self._open:
+            cid, channel_id = self._open.pop(rnd.randrange(len(self._open)))
+            keyword = 'TEARDOWN_REQ' if rnd.random() < 0.5 else 'Channel Closed'
+            text = f"{keyword} PeerCid is {cid} ChanId[{channel_id}]"
+        else:
+            text = rnd.choice(NOISE_LINES)
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        return f"[{stamp}.000] {text}\r\n".encode('utf-8')
+
+    def write_line(self, data):
+        """写入一行（按 partial_ratio 拆成两次写入）"""
+        if self.partial_ratio and self._random.random() < self.partial_ratio:
+            cut = self._random.randrange(1, len(data))
+            self._file.write(data[:cut])
+            self._file.write(data[cut:])
+        else:
+            self._file.write(data)
+        self.lines += 1
+        self._file_lines += 1
+        if self.rotate_lines and self._file_lines >= self.rotate_lines:
+            self.rotate()
+
+    def write_burst(self):
+        for _ in range(self.burst):
+            self.write_line(self.next_line())
+
+    def write_bulk(self, count, block_lines=10000):
+        """尽快写入 count 行（大块写入，不拆行），用于准备吞吐测试数据"""
+        written = 0
+        while written < count:
+            n = min(block_lines, count - written)
+            self._file.write(b''.join(self.next_line() for _ in range(n)))
+            written += n
+        self.lines += count
+        return self.path
+
+    def run(self, rate, duration):
+        """
+        按 rate 行/秒写入 duration 秒（rate 为 0 时不限速）
+
+        突发模式下每次写入 burst 行，然后休眠 burst / rate 秒
+        """
+        deadline = time.perf_counter() + duration
+        interval = self.burst / rate if rate else 0
+        next_time = time.perf_counter()
+        while time.perf_counter() < deadline:
+            self.write_burst()
+            if interval:
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def main():
+    """python benchmarks/log_generator.py <目录> [--rate 行/秒] [--duration 秒] ..."""
+    parser = argparse.ArgumentParser(description="生成合成 ich_run 日志")
+    parser.add_argument('directory')
+    parser.add_argument('--rate', type=float, default=1000, help="行/秒，0 表示不限速")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--lines', type=int, default=0, help="直接写入指定行数后退出（忽略 rate）")
+    parser.add_argument('--create-ratio', type=float, default=0.01)
+    parser.add_argument('--end-ratio', type=float, default=0.01)
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--rotate-lines', type=int, default=0)
+    parser.add_argument('--partial-ratio', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    log = SyntheticLog(args.directory, create_ratio=args.create_ratio, end_ratio=args.end_ratio,
+                       burst=args.burst, rotate_lines=args.rotate_lines,
+                       partial_ratio=args.partial_ratio, seed=args.seed)
+    try:
+        if args.lines:
+            log.write_bulk(args.lines)
+        else:
+            log.run(args.rate, args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log.close()
+    print(f"{log.lines} 行，{log.creates} 个通道开始，最后文件 {log.path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
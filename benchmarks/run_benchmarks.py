@@ -0,0 +1,275 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from config_loader import config, load_sources
+from log_tailer import LogTailer
+from line_matcher import LineMatcher, DEFAULT_PATTERNS
+from log_finder import LogFinder, LogIndex
+from monitor_engine import MonitorEngine
+from log_generator import SyntheticLog
+
+
+def _best_of(repeat, func):
+    """运行 repeat 次，返回最短耗时（秒）和最后一次的返回值"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        'count': len(values),
+        'p50_ms': pick(0.50) * 1000,
+        'p95_ms': pick(0.95) * 1000,
+        'p99_ms': pick(0.99) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+
+
+def bench_tail_read(workdir, lines, repeat):
+    """LogTailer 读取吞吐：从头读到末尾"""
+    log = SyntheticLog(workdir / 'tail', seed=1)
+    path = log.write_bulk(lines)
+    log.close()
+    size = os.path.getsize(path)
+
+    def run():
+        tailer = LogTailer(str(path))
+        total = 0
+        while True:
+            chunk = tailer.read()
+            if not chunk:
+                return total
+            total += len(chunk)
+
+    elapsed, total = _best_of(repeat, run)
+    return {'bytes': size, 'lines': lines, 'seconds': elapsed,
+            'mb_per_s': size / 1024 / 1024 / elapsed, 'lines_per_s': lines / elapsed,
+            'complete': total == size}
+
+
+def bench_match(workdir, lines, repeat):
+    """通道匹配吞吐：LineMatcher.scan 与逐行解码 + 正则（旧实现）对比"""
+    log = SyntheticLog(workdir / 'match', seed=2)
+    path = log.write_bulk(lines)
+    log.close()
+    data = Path(path).read_bytes()
+    # 按行对齐切分为 4MB 左右的块（与 LogTailer.read() 的单次上限一致）
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        end = data.find(b'\n', min(pos + 4 * 1024 * 1024, len(data) - 1))
+        end = len(data) if end < 0 else end + 1
+        chunks.append(data[pos:end])
+        pos = end
+
+    patterns = dict(DEFAULT_PATTERNS, **config.get('patterns', {}))
+    matcher = LineMatcher(patterns)
+
+    def run_scan():
+        return sum(len(matcher.scan(chunk)) for chunk in chunks)
+
+    re_create = re.compile(patterns['channel_create'])
+    re_end = re.compile(patterns['channel_end'])
+    end_keywords = patterns['end_keywords']
+
+    def run_per_line():
+        count = 0
+        for chunk in chunks:
+            for line in chunk.decode('utf-8', errors='ignore').splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                if re_create.search(line):
+                    count += 1
+                elif any(kw in line for kw in end_keywords) and re_end.search(line):
+                    count += 1
+        return count
+
+    scan_time, scan_events = _best_of(repeat, run_scan)
+    line_time, line_events = _best_of(repeat, run_per_line)
+    size = len(data)
+    return {
+        'bytes': size, 'lines': lines, 'events': scan_events,
+        'scan': {'seconds': scan_time, 'mb_per_s': size / 1024 / 1024 / scan_time,
+                 'lines_per_s': lines / scan_time},
+        'per_line_baseline': {'seconds': line_time, 'mb_per_s': size / 1024 / 1024 / line_time,
+                              'lines_per_s': lines / line_time},
+        'speedup': line_time / scan_time,
+        'consistent': scan_events == line_events,
+    }
+
+
+def bench_find_latest(workdir, files, repeat):
+    """大目录下查找最新日志：LogFinder.find_latest（整目录遍历）与 LogIndex.refresh（增量探测）"""
+    directory = workdir / 'finder'
+    directory.mkdir()
+    for i in range(files):
+        (directory / f"ich_run_{i}.log").touch()
+    for i in range(files // 10):
+        (directory / f"other_{i}.txt").touch()
+
+    finder = LogFinder('ich_run_*.log', [])
+    full, latest = _best_of(repeat, lambda: finder.find_latest(str(directory)))
+
+    index = LogIndex(str(directory), 'ich_run_*.log')
+    index.scan()
+    refresh, _ = _best_of(repeat, index.refresh)
+    return {'files': files, 'find_latest_ms': full * 1000, 'refresh_ms': refresh * 1000,
+            'correct': latest is not None and Path(latest).name == f"ich_run_{files - 1}.log"}
+
+
+def bench_latency(workdir, rate, duration, burst, partial_ratio):
+    """
+    端到端延迟：写入"Create Channel"行到 MonitorEngine 交付事件的时间
+
+    每个开始行使用唯一的设备号，背景行按 rate 行/秒写入
+    """
+    directory = workdir / 'latency'
+    log = SyntheticLog(directory, create_ratio=0, end_ratio=0, burst=burst,
+                       partial_ratio=partial_ratio, seed=3)
+    source = dict(load_sources()[0], name='benchmark', log_dir=str(directory))
+
+    written = {}
+    latencies = []
+    received = threading.Event()
+
+    def on_events(events):
+        now = time.perf_counter()
+        for event in events:
+            sent = written.pop(event.cid, None)
+            if sent is not None:
+                latencies.append(now - sent)
+        if not written:
+            received.set()
+
+    # 检查点写入临时目录，不影响正式运行的 checkpoint.json
+    engine = MonitorEngine([source], on_events=on_events, checkpoint_path=directory / 'checkpoint.json')
+    engine.resume('benchmark', str(log.path))
+    thread = threading.Thread(target=engine.run, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+
+    interval = burst / rate if rate else 0
+    create_every = max(1, int(rate / 20))  # 约每秒 20 个开始事件
+    deadline = time.perf_counter() + duration
+    next_time = time.perf_counter()
+    sequence = 0
+    while time.perf_counter() < deadline:
+        for _ in range(burst):
+            sequence += 1
+            if sequence % create_every == 0:
+                cid = 900000000 + sequence
+                data = f"[{time.strftime('%Y-%m-%d %H:%M:%S')}.000] {log.create_line(cid, 1)}\r\n".encode()
+                written[str(cid)] = time.perf_counter()
+                log.write_line(data)
+            else:
+                log.write_line(log.next_line())
+        if interval:
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    received.wait(5)
+    engine.stop()
+    thread.join(5)
+    log.close()
+
+    result = _percentiles(latencies)
+    result.update({'rate': rate, 'burst': burst, 'partial_ratio': partial_ratio,
+                   'lost': len(written), 'lines': log.lines,
+                   'watcher': type(engine.watcher).__name__,
+                   'batch_window': config.get('monitor.batch_window', 0)})
+    return result
+
+
+def _version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+BENCHMARKS = ['tail_read', 'match', 'find_latest', 'latency']
+
+
+def main():
+    """python benchmarks/run_benchmarks.py [--quick] [-o results.json] [--only 名称 ...]"""
+    parser = argparse.ArgumentParser(description="监控管线性能基准")
+    parser.add_argument('-o', '--output', help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS)
+    parser.add_argument('--quick', action='store_true', help="缩小规模，快速检查")
+    parser.add_argument('--lines', type=int, default=1000000, help="吞吐测试的日志行数")
+    parser.add_argument('--files', type=int, default=20000, help="查找测试的目录文件数")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rate', type=float, default=2000, help="延迟测试的写入速率（行/秒）")
+    parser.add_argument('--duration', type=float, default=5, help="延迟测试时长（秒）")
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--partial-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.quick:
+        args.lines, args.files, args.repeat, args.duration = 100000, 2000, 1, 2
+
+    selected = args.only or BENCHMARKS
+    workdir = Path(tempfile.mkdtemp(prefix='video_stalker_bench_'))
+    results = {}
+    try:
+        if 'tail_read' in selected:
+            results['tail_read'] = bench_tail_read(workdir, args.lines, args.repeat)
+        if 'match' in selected:
+            results['match'] = bench_match(workdir, args.lines, args.repeat)
+        if 'find_latest' in selected:
+            results['find_latest'] = bench_find_latest(workdir, args.files, args.repeat)
+        if 'latency' in selected:
+            results['latency'] = bench_latency(workdir, args.rate, args.duration,
+                                               args.burst, args.partial_ratio)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'version': _version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': vars(args),
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
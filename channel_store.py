@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+
+
+class ChannelStore:
+    """
+    有界的通道状态表 - 键为通道（或设备）标识，值为最近一次更新的时间
+
+    条目按更新时间排序：超过 ttl 未更新的条目在下次写入时从最旧一端淘汰，
+    条目数超过 max_size 时淘汰最久未更新的条目。查找、写入均为 O(1)（均摊）。
+    漏掉结束行的通道因此不会永久占用内存。
+    """
+
+    def __init__(self, ttl=None, max_size=None, clock=time.monotonic):
+        """
+        Args:
+            ttl: 条目有效期（秒），None 或 0 表示不过期
+            max_size: 最大条目数，None 或 0 表示不限
+            clock: 时间函数，默认 time.monotonic
+        """
+        self.ttl = ttl or None
+        self.max_size = max_size or None
+        self._clock = clock
+        self._items = OrderedDict()
+
+    def set_limits(self, ttl=None, max_size=None):
+        """修改有效期和容量（配置热重载），立即按新限制淘汰"""
+        self.ttl = ttl or None
+        self.max_size = max_size or None
+        self._evict(self._clock())
+
+    def _expired(self, stamp, now):
+        return self.ttl is not None and now - stamp >= self.ttl
+
+    def _evict(self, now):
+        items = self._items
+        if self.ttl is not None:
+            while items:
+                key, stamp = next(iter(items.items()))
+                if not self._expired(stamp, now):
+                    break
+                del items[key]
+        if self.max_size is not None:
+            while len(items) > self.max_size:
+                items.popitem(last=False)
+
+    def add(self, key, now=None):
+        """
+        写入或刷新条目
+
+        Returns:
+            bool: 写入前条目不存在（或已过期）时为 True
+        """
+        now = self._clock() if now is None else now
+        stamp = self._items.pop(key, None)
+        self._items[key] = now
+        self._evict(now)
+        return stamp is None or self._expired(stamp, now)
+
+    def update(self, keys):
+        """批量写入"""
+        now = self._clock()
+        for key in keys:
+            self._items.pop(key, None)
+            self._items[key] = now
+        self._evict(now)
+
+    def get(self, key, default=None):
+        """返回条目最近一次更新的时间，不存在或已过期时返回 default"""
+        stamp = self._items.get(key)
+        if stamp is None or self._expired(stamp, self._clock()):
+            return default
+        return stamp
+
+    def discard(self, key):
+        """
+        删除条目
+
+        Returns:
+            bool: 条目存在（且未过期）时为 True
+        """
+        stamp = self._items.pop(key, None)
+        return stamp is not None and not self._expired(stamp, self._clock())
+
+    def clear(self):
+        self._items.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        self._evict(self._clock())
+        return len(self._items)
+
+    def __iter__(self):
+        self._evict(self._clock())
+        return iter(list(self._items))
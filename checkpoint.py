@@ -0,0 +1,117 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from config_loader import config
+
+
+class Checkpoint:
+    """
+    读取进度检查点 - 记录日志文件标识、字节偏移和活跃通道
+
+    写入采用"临时文件 + 替换"，进程中途退出不会留下损坏的检查点
+    """
+
+    HEAD_BYTES = 4096
+
+    _file_lock = threading.Lock()
+
+    def __init__(self, path=None, key='default'):
+        """
+        Args:
+            path: 检查点文件路径，默认读取 monitor.checkpoint_path（为空时与脚本同目录）
+            key: 监控源名称，同一个检查点文件可保存多个监控源
+        """
+        path = path or config.get('monitor.checkpoint_path') or Path(__file__).parent / "checkpoint.json"
+        self.path = Path(path)
+        self.key = key
+
+    @classmethod
+    def identify(cls, log_path):
+        """
+        计算日志文件标识：inode + 文件头哈希
+
+        Returns:
+            dict 或 None（文件不存在）
+        """
+        try:
+            st = os.stat(log_path)
+            with open(log_path, 'rb') as f:
+                head = f.read(cls.HEAD_BYTES)
+        except OSError:
+            return None
+        return {
+            'dev': st.st_dev,
+            'inode': st.st_ino,
+            'head_len': len(head),
+            'head_hash': hashlib.sha1(head).hexdigest(),
+        }
+
+    @classmethod
+    def _same_file(cls, log_path, identity):
+        try:
+            st = os.stat(log_path)
+            with open(log_path, 'rb') as f:
+                head = f.read(identity['head_len'])
+        except (OSError, KeyError, TypeError):
+            return False
+        if (st.st_dev, st.st_ino) != (identity.get('dev'), identity.get('inode')):
+            return False
+        return (len(head) == identity['head_len']
+                and hashlib.sha1(head).hexdigest() == identity.get('head_hash'))
+
+    def _load_all(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def restore(self, log_path):
+        """
+        读取与当前日志文件匹配的检查点
+
+        Returns:
+            (offset, active_channels) 或 None（无检查点或文件已不是同一个）
+        """
+        entry = self._load_all().get(self.key)
+        if not isinstance(entry, dict) or entry.get('path') != str(log_path):
+            return None
+        if not self._same_file(log_path, entry.get('identity')):
+            return None
+
+        offset = entry.get('offset', 0)
+        try:
+            if os.path.getsize(log_path) < offset:
+                return None
+        except OSError:
+            return None
+        return offset, set(entry.get('active', []))
+
+    def save(self, log_path, offset, active_channels):
+        """原子写入检查点"""
+        identity = self.identify(log_path)
+        if identity is None:
+            return False
+
+        with Checkpoint._file_lock:
+            data = self._load_all()
+            data[self.key] = {
+                'path': str(log_path),
+                'identity': identity,
+                'offset': offset,
+                'active': sorted(active_channels),
+            }
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError:
+                return False
+        return True
@@ -1,18 +1,205 @@
-import json
 import os
+import re
+import copy
+import json
+import threading
 from pathlib import Path
+from types import MappingProxyType
+
+
+# 数值配置项（必须为非负数）
+NUMERIC_KEYS = (
+    'process.wait_interval', 'process.init_delay',
+    'monitor.check_interval', 'monitor.watch_timeout', 'monitor.batch_window',
+    'monitor.tail_scan_bytes', 'monitor.checkpoint_interval', 'monitor.file_wait_interval',
+    'monitor.notification_cooldown', 'monitor.channel_ttl', 'monitor.channel_max',
+    'monitor.config_reload_interval', 'notification.duration_ms',
+    'metrics.port', 'metrics.dump_interval',
+    'monitor.idle_timeout_max', 'monitor.poll_interval_max',
+)
+
+# 路径配置项（相对路径以配置文件所在目录为基准）
+PATH_KEYS = ('log.directory', 'monitor.checkpoint_path', 'metrics.dump_path')
+
+# 正则配置项（加载时预编译，channel_* 需要两个捕获组：设备号、通道号）
+REGEX_KEYS = {
+    'patterns.channel_create': 2,
+    'patterns.channel_end': 2,
+    'patterns.timestamp': 1,
+}
+
+# 取值受限的配置项
+CHOICE_KEYS = {
+    'monitor.engine': ('thread', 'asyncio'),
+    'monitor.start_position': ('begin', 'end', 'scan'),
+}
+
+_MISSING = object()
+
+
+def compile_patterns(patterns, prefix='patterns'):
+    """
+    编译并校验一组 patterns 中的正则（REGEX_KEYS 中 patterns.* 各项，含捕获组数量）
+
+    Args:
+        patterns: patterns 配置字典（顶层或某个监控源合并后的）
+        prefix: 错误信息中的配置路径前缀
+
+    Returns:
+        (regexes, errors): {名称: 已编译的正则}，错误信息列表
+    """
+    regexes = {}
+    errors = []
+    if not isinstance(patterns, dict):
+        return regexes, [f"{prefix} 必须是对象"]
+    for key, groups in REGEX_KEYS.items():
+        section, _, name = key.partition('.')
+        value = patterns.get(name) if section == 'patterns' else None
+        if not value:
+            continue
+        try:
+            compiled = re.compile(value)
+        except (re.error, TypeError) as e:
+            errors.append(f"{prefix}.{name} 不是有效的正则: {e}")
+            continue
+        if compiled.groups < groups:
+            errors.append(f"{prefix}.{name} 至少需要 {groups} 个捕获组")
+            continue
+        regexes[name] = compiled
+    return regexes, errors
+
+
+def _freeze(obj):
+    """递归转换为只读结构：dict -> MappingProxyType，list -> tuple"""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(item) for item in obj)
+    return obj
+
+
+def _is_absolute(path):
+    # 同时识别 Windows 盘符路径，配置文件可以在不同系统间共用
+    return os.path.isabs(path) or re.match(r'^[A-Za-z]:[\\/]', path) is not None
+
+
+class ConfigSnapshot:
+    """
+    不可变的配置快照
+    
+    构造时完成环境变量展开、路径解析、数值和正则校验，并把所有点号路径
+    展开为一张表，get() 只做一次字典查找。配置无效时抛出 ValueError。
+    """
+    
+    __slots__ = ('path', 'signature', 'regexes', '_data', '_flat', '_raw')
+    
+    def __init__(self, raw, path=None, signature=None):
+        """
+        Args:
+            raw: json.load 得到的原始配置字典
+            path: 配置文件路径（用于解析相对路径）
+            signature: 文件签名 (mtime_ns, size)，用于检测变化
+        """
+        data = Config._expand_env_vars(raw)
+        base = Path(path).parent if path else Path(__file__).parent
+        errors = []
+        
+        flat = {}
+        
+        def walk(prefix, value):
+            flat[prefix] = value
+            if isinstance(value, dict):
+                for key, child in value.items():
+                    walk(f"{prefix}.{key}", child)
+        
+        for key, value in data.items():
+            walk(key, value)
+        
+        for key in PATH_KEYS:
+            value = flat.get(key)
+            if isinstance(value, str) and value and not _is_absolute(value):
+                section, _, name = key.partition('.')
+                data[section][name] = str(base / os.path.expanduser(value))
+        
+        for key in NUMERIC_KEYS:
+            value = flat.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                errors.append(f"{key} 必须是非负数: {value!r}")
+        
+        regexes, pattern_errors = compile_patterns(data.get('patterns', {}))
+        errors.extend(pattern_errors)
+        
+        for key, choices in CHOICE_KEYS.items():
+            value = flat.get(key, _MISSING)
+            if value is not _MISSING and value not in choices:
+                errors.append(f"{key} 只能是 {' / '.join(choices)}: {value!r}")
+        
+        if errors:
+            raise ValueError("配置无效: " + "; ".join(errors))
+        
+        # 路径解析后重新展开
+        flat.clear()
+        for key, value in data.items():
+            walk(key, value)
+        
+        set_attr = object.__setattr__
+        set_attr(self, 'path', path)
+        set_attr(self, 'signature', signature)
+        set_attr(self, 'regexes', MappingProxyType(regexes))
+        set_attr(self, '_raw', data)
+        set_attr(self, '_data', _freeze(data))
+        set_attr(self, '_flat', {key: _freeze(value) for key, value in flat.items()})
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot 是只读的")
+    
+    def get(self, key_path, default=None):
+        """
+        获取配置值，支持点号路径如 'process.name'
+        
+        返回的字典 / 列表为只读的 MappingProxyType / tuple
+        """
+        value = self._flat.get(key_path, _MISSING)
+        return default if value is _MISSING else value
+    
+    def __getitem__(self, key):
+        return self._data[key]
+    
+    @property
+    def raw(self):
+        """可修改的配置字典副本"""
+        return copy.deepcopy(self._raw)
 
 
 class Config:
-    """配置管理类 - 单例模式"""
+    """
+    配置管理类 - 单例模式
+    
+    持有当前的 ConfigSnapshot：读取时取当前快照，重新加载时整体替换（原子操作），
+    正在运行的组件通过 subscribe() 收到新快照
+    """
     
     _instance = None
-    _config_data = None
+    _lock = threading.Lock()
     
     def __new__(cls, config_path=None):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._load(config_path or cls._default_path())
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance._path = Path(config_path or cls._default_path())
+                instance._snapshot = None
+                instance._listeners = []
+                instance._watch_task = None
+                instance._failed_signature = None
+                cls._instance = instance
+            elif config_path is not None and Path(config_path) != cls._instance._path:
+                # 指定了其他配置文件：改为加载该文件
+                instance = cls._instance
+                instance._path = Path(config_path)
+                if instance._snapshot is not None:
+                    instance._swap(instance._load(instance._path))
         return cls._instance
     
     @staticmethod
@@ -20,16 +207,29 @@ class Config:
         """获取默认配置文件路径（与脚本同目录）"""
         return Path(__file__).parent / "config.json"
     
+    @property
+    def path(self):
+        return self._path
+    
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    
     def _load(self, path):
-        """加载JSON配置文件"""
+        """加载JSON配置文件，返回 ConfigSnapshot"""
         path = Path(path)
         if not path.exists():
             raise FileNotFoundError(f"配置文件不存在: {path}")
         
+        signature = self._signature(path)
         with open(path, 'r', encoding='utf-8') as f:
             raw_data = json.load(f)
         
-        self._config_data = self._expand_env_vars(raw_data)
+        snapshot = ConfigSnapshot(raw_data, path, signature)
+        # 监控源名称重复、监控源的 patterns 无效时与其他配置错误一样拒绝（热重载时保留当前快照）
+        load_sources(snapshot)
+        return snapshot
     
     @staticmethod
     def _expand_env_vars(obj):
@@ -42,6 +242,25 @@ class Config:
             return os.path.expandvars(obj)
         return obj
     
+    @property
+    def snapshot(self):
+        """当前配置快照（首次访问时读取文件）"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load(self._path)
+                snapshot = self._snapshot
+        return snapshot
+    
+    def _swap(self, snapshot):
+        self._snapshot = snapshot
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception:
+                pass
+    
     def get(self, key_path, default=None):
         """
         获取配置值，支持点号路径如 'process.name'
@@ -50,26 +269,110 @@ class Config:
             key_path: 配置键路径，如 "log.directory"
             default: 默认值
         """
-        keys = key_path.split('.')
-        value = self._config_data
-        
-        for key in keys:
-            if isinstance(value, dict) and key in value:
-                value = value[key]
-            else:
-                return default
-        
-        return value
+        return self.snapshot.get(key_path, default)
     
     def __getitem__(self, key):
         """支持 config['key'] 访问"""
-        return self._config_data[key]
+        return self.snapshot[key]
     
     @property
     def raw(self):
         """获取原始配置字典"""
-        return self._config_data.copy()
+        return self.snapshot.raw
+    
+    def subscribe(self, listener):
+        """注册配置变化回调 listener(snapshot)，在重新加载的线程中调用"""
+        self._listeners.append(listener)
+    
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def reload(self):
+        """
+        重新读取配置文件；文件无效时保留当前快照
+        
+        Returns:
+            bool: 是否已切换到新快照
+        """
+        try:
+            snapshot = self._load(self._path)
+        except (OSError, ValueError):
+            return False
+        self._swap(snapshot)
+        return True
+    
+    def check_for_changes(self):
+        """文件签名变化时重新加载，返回是否已切换"""
+        try:
+            signature = self._signature(self._path)
+        except OSError:
+            return False
+        if signature == self.snapshot.signature or signature == self._failed_signature:
+            return False
+        if self.reload():
+            return True
+        self._failed_signature = signature
+        return False
+    
+    def watch(self, interval=None):
+        """
+        每 monitor.config_reload_interval 秒检查配置文件是否变化（为 0 时不检查），
+        由全局调度器执行
+        """
+        from scheduler import scheduler
+        
+        interval = self.get('monitor.config_reload_interval', 2) if interval is None else interval
+        if not interval or self._watch_task is not None:
+            return
+        self._watch_task = scheduler.call_every(interval, self.check_for_changes, name="config-watch")
+
+
+def load_sources(cfg=None):
+    """
+    读取监控源列表
+    
+    config.json 中的 sources 为列表时，每一项可覆盖 process / log_dir /
+    pattern / backup_paths / patterns，未给出的字段取顶层配置；
+    没有 sources 时只有一个名为 default 的监控源。
+    
+    Returns:
+        list[dict]: 每项包含 name, process, log_dir, pattern, backup_paths, patterns，
+                    以及 regexes（patterns 中已编译的正则，传给 LineMatcher）
+    
+    Raises:
+        ValueError: 监控源名称重复（名称用作检查点、指标和事件中的键），
+                    或合并后的 patterns 中有无效的正则
+    """
+    cfg = cfg or config
+    defaults = {
+        'name': 'default',
+        'process': cfg.get('process.name'),
+        'log_dir': cfg.get('log.directory'),
+        'pattern': cfg.get('log.pattern', 'ich_run_*.log'),
+        'backup_paths': cfg.get('log.backup_paths', []),
+        'patterns': cfg.get('patterns', {}),
+    }
+    
+    entries = cfg.get('sources') or [{}]
+    sources = []
+    names = set()
+    for i, entry in enumerate(entries):
+        source = dict(defaults)
+        source.update({k: v for k, v in entry.items() if v is not None})
+        source['patterns'] = dict(defaults['patterns'], **entry.get('patterns', {}))
+        if entry and 'name' not in entry:
+            source['name'] = f"source{i + 1}"
+        if source['name'] in names:
+            raise ValueError(f"配置无效: sources 中的监控源名称重复: {source['name']}")
+        source['regexes'], errors = compile_patterns(source['patterns'],
+                                                     f"sources[{source['name']}].patterns")
+        if errors:
+            raise ValueError("配置无效: " + "; ".join(errors))
+        names.add(source['name'])
+        sources.append(source)
+    return sources
 
 
-# 全局配置实例（首次导入时加载）
+# 全局配置实例（首次读取配置时加载）
 config = Config()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+
+from config_loader import config
+from metrics import metrics, SIZE_BUCKETS
+
+
+_batch_size = metrics.histogram('batch_size', "每批交付的事件数", SIZE_BUCKETS)
+_batch_delay = metrics.histogram('batch_delay_seconds', "事件从读取到交付的等待时间")
+_cancelled = metrics.counter('batch_cancelled_total', "同一批次内开始后又结束、相互抵消的事件数")
+
+
+class EventBatcher:
+    """
+    事件批处理 - 在时间窗口内收集通道事件，每个通道只交付窗口结束时的净变化
+
+    同一通道（监控源、设备号、通道号）的事件按状态合并：
+    - 开始后又结束（或结束后又开始）相互抵消，两条都不交付，通道状态与窗口前相同
+    - 同类事件重复出现时保留最后一条
+    因此交付给输出的开始 / 结束始终与各通道的实际状态一致。
+    window 为 0 时每个读取周期交付一批
+    """
+
+    def __init__(self, window=None):
+        """
+        Args:
+            window: 合并窗口（秒），默认读取 monitor.batch_window
+        """
+        self.window = config.get('monitor.batch_window', 0) if window is None else window
+        self._events = OrderedDict()
+        self._opened_at = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, events):
+        """加入事件，按通道合并（见类说明）"""
+        pending = self._events
+        for event in events:
+            key = (event.source, event.cid, event.channel_id)
+            previous = pending.get(key)
+            if previous is not None and previous.kind != event.kind:
+                del pending[key]
+                _cancelled.inc(2)
+                continue
+            if self._opened_at is None:
+                self._opened_at = time.monotonic()
+            pending[key] = event
+        if not pending:
+            # 全部抵消：没有待交付的批次
+            self._opened_at = None
+
+    def remaining(self):
+        """距离当前批次到期的秒数，无待交付事件时返回 None"""
+        if self._opened_at is None:
+            return None
+        return max(0.0, self._opened_at + self.window - time.monotonic())
+
+    def due(self):
+        """当前批次是否应当交付"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def flush(self):
+        """取出当前批次"""
+        batch = list(self._events.values())
+        if batch:
+            _batch_size.observe(len(batch))
+            _batch_delay.observe(time.monotonic() - self._opened_at)
+        self._events.clear()
+        self._opened_at = None
+        return batch
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import stat
+import socket
+import argparse
+import selectors
+import threading
+from collections import deque
+
+from metrics import metrics
+
+
+_published = metrics.counter('bus_published_total', "事件总线发布的消息数")
+_dropped = metrics.counter('bus_dropped_total', "订阅者积压过多被丢弃的消息数")
+
+
+def _parse_address(address):
+    """
+    Returns:
+        (family, address): "tcp://host:port" -> AF_INET，"unix:///path" -> AF_UNIX
+    """
+    if address.startswith('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class _Subscriber:
+    __slots__ = ('sock', 'inbox', 'pending', 'out', 'ready', 'dropped')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbox = bytearray()  # 尚未收到完整的订阅请求行
+        self.pending = deque()    # 待发送的消息
+        self.out = b''            # 正在发送的消息剩余部分
+        self.ready = False
+        self.dropped = 0
+
+
+class EventBus:
+    """
+    本地事件总线 - 通过 Unix 域套接字或回环 TCP 向任意数量的订阅者推送 JSON Lines
+
+    订阅者连接后先发送一行订阅请求：
+        {}                只接收新消息
+        {"since": 序号}   先补发回放缓冲区中序号大于该值的消息（0 表示全部），再接收新消息
+    每条消息带递增的 seq，订阅者可据此发现丢失并用 since 续订。
+
+    publish() 只把编码好的消息放入各订阅者的队列，套接字读写全部在总线线程中以
+    非阻塞方式完成；某个订阅者的队列超过 max_pending 时丢弃其最旧的消息，
+    慢订阅者不会拖慢监控线程。
+    """
+
+    def __init__(self, address, replay=1000, max_pending=1000):
+        """
+        Args:
+            address: "tcp://127.0.0.1:9465" 或 "unix:///tmp/video_stalker.sock"
+            replay: 回放缓冲区保留的消息条数
+            max_pending: 每个订阅者最多积压的消息条数
+
+        Raises:
+            ValueError: unix:// 地址已存在但不是套接字文件（不会删除）
+        """
+        self.address = address
+        self.max_pending = max_pending
+        self._ring = deque(maxlen=replay)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._running = True
+
+        family, bind_address = _parse_address(address)
+        self._unix_path = bind_address if family == socket.AF_UNIX else None
+        if self._unix_path:
+            try:
+                mode = os.lstat(self._unix_path).st_mode
+            except FileNotFoundError:
+                mode = None
+            if mode is not None:
+                if not stat.S_ISSOCK(mode):
+                    # 多半是地址写错了：只删除上次运行遗留的套接字文件，不碰普通文件
+                    raise ValueError(f"事件总线地址 {self._unix_path} 已存在且不是套接字文件")
+                os.unlink(self._unix_path)
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(bind_address)
+        self._server.listen(16)
+        self._server.setblocking(False)
+
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+
+        metrics.gauge('bus_subscribers', "事件总线当前订阅者数").func = lambda: len(self._subscribers)
+        self._thread = threading.Thread(target=self._run, name="event-bus", daemon=True)
+        self._thread.start()
+
+    @property
+    def server_address(self):
+        """实际监听的地址（端口为 0 时由系统分配）"""
+        return self._server.getsockname()
+
+    def publish(self, records):
+        """
+        发布一批消息（任意线程，不阻塞）
+
+        Args:
+            records: 可 JSON 序列化的字典列表，发布时加入 seq 字段
+        """
+        if not records:
+            return
+        with self._lock:
+            lines = []
+            for record in records:
+                self._seq += 1
+                line = (json.dumps(dict(record, seq=self._seq), ensure_ascii=False) + '\n').encode('utf-8')
+                self._ring.append((self._seq, line))
+                lines.append(line)
+            _published.inc(len(lines))
+            for subscriber in self._subscribers.values():
+                if subscriber.ready:
+                    self._enqueue(subscriber, lines)
+        self._wakeup()
+
+    def _enqueue(self, subscriber, lines):
+        pending = subscriber.pending
+        pending.extend(lines)
+        overflow = len(pending) - self.max_pending
+        if overflow > 0:
+            for _ in range(overflow):
+                pending.popleft()
+            subscriber.dropped += overflow
+            _dropped.inc(overflow)
+
+    def _wakeup(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            # 唤醒缓冲区已满：总线线程必然会被唤醒
+            pass
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        subscriber = _Subscriber(sock)
+        with self._lock:
+            self._subscribers[sock] = subscriber
+        self._selector.register(sock, selectors.EVENT_READ, subscriber)
+
+    def _drop(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber.sock, None)
+        try:
+            self._selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
+
+    def _read(self, subscriber):
+        try:
+            data = subscriber.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(subscriber)
+            return
+        if subscriber.ready:
+            # 订阅后的输入忽略
+            return
+
+        subscriber.inbox += data
+        newline = subscriber.inbox.find(b'\n')
+        if newline < 0:
+            if len(subscriber.inbox) > 4096:
+                self._drop(subscriber)
+            return
+        try:
+            request = json.loads(subscriber.inbox[:newline] or b'{}')
+            since = request.get('since') if isinstance(request, dict) else None
+        except ValueError:
+            self._drop(subscriber)
+            return
+        subscriber.inbox.clear()
+
+        with self._lock:
+            if since is not None:
+                # 回放本身受回放缓冲区大小限制，不按 max_pending 截断
+                subscriber.pending.extend(line for seq, line in self._ring if seq > since)
+            subscriber.ready = True
+
+    def _flush(self, subscriber):
+        """尽量发送积压消息，返回是否仍有未发送的数据"""
+        sock = subscriber.sock
+        while True:
+            if not subscriber.out:
+                with self._lock:
+                    if not subscriber.pending:
+                        return False
+                    # 合并多条消息一次发送
+                    count = min(len(subscriber.pending), 64)
+                    subscriber.out = b''.join(subscriber.pending.popleft() for _ in range(count))
+            try:
+                sent = sock.send(subscriber.out)
+            except BlockingIOError:
+                return True
+            except OSError:
+                self._drop(subscriber)
+                return False
+            subscriber.out = subscriber.out[sent:]
+
+    def _run(self):
+        while self._running:
+            for key, mask in self._selector.select():
+                if key.fileobj is self._server:
+                    self._accept()
+                elif key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                elif mask & selectors.EVENT_READ:
+                    self._read(key.data)
+
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+            for subscriber in subscribers:
+                if subscriber.sock.fileno() < 0:
+                    continue
+                events = selectors.EVENT_READ
+                if self._flush(subscriber):
+                    events |= selectors.EVENT_WRITE
+                if subscriber.sock.fileno() >= 0:
+                    self._selector.modify(subscriber.sock, events, subscriber)
+
+        for subscriber in list(self._subscribers.values()):
+            self._drop(subscriber)
+        self._selector.close()
+        self._server.close()
+        self._wake_r.close()
+        if self._unix_path:
+            try:
+                os.unlink(self._unix_path)
+            except OSError:
+                pass
+
+    def close(self):
+        self._running = False
+        self._wakeup()
+        self._thread.join(2)
+        self._wake_w.close()
+
+
+def subscribe(address, since=None, timeout=None):
+    """
+    订阅事件总线（供看板、录制等本地工具使用）
+
+    Args:
+        address: 与 EventBus 相同的地址
+        since: 补发序号大于该值的缓冲消息，None 表示只接收新消息
+
+    Yields:
+        dict: 消息（含 seq）
+    """
+    family, connect_address = _parse_address(address)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(connect_address)
+        request = {} if since is None else {'since': since}
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+def main():
+    """python event_bus.py <地址> [--since 序号]：把收到的消息逐行输出"""
+    parser = argparse.ArgumentParser(description="订阅监控事件总线")
+    parser.add_argument('address', help='如 tcp://127.0.0.1:9465 或 unix:///tmp/video_stalker.sock')
+    parser.add_argument('--since', type=int, default=None, help="先补发序号大于该值的缓冲消息")
+    args = parser.parse_args()
+
+    try:
+        for message in subscribe(args.address, args.since):
+            print(json.dumps(message, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"无法连接 {args.address}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import sys
+import json
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from line_matcher import CHANNEL_START
+from metrics import metrics, SIZE_BUCKETS
+
+
+_written = metrics.counter('journal_written_total', "写入事件日志的事件数")
+_dropped = metrics.counter('journal_dropped_total', "写入队列已满被丢弃的事件数")
+_commit_seconds = metrics.histogram('journal_commit_seconds', "事件日志单次提交耗时")
+_batch_size = metrics.histogram('journal_batch_size', "事件日志每次提交的事件数", SIZE_BUCKETS)
+_errors = metrics.counter('errors_total', "按类型统计的异常次数", label='type')
+
+# events.time 为日志行时间戳，行中没有时间戳时为写入时间；observed_at 始终为写入时间
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    observed_at REAL,
+    source TEXT,
+    kind TEXT NOT NULL,
+    cid TEXT NOT NULL,
+    channel_id TEXT
+);
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE INDEX IF NOT EXISTS events_cid ON events (cid, time);
+CREATE INDEX IF NOT EXISTS events_channel ON events (channel_id, time);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    cid TEXT NOT NULL,
+    channel_id TEXT,
+    start REAL NOT NULL,
+    end REAL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start);
+CREATE INDEX IF NOT EXISTS sessions_cid ON sessions (cid, start);
+CREATE INDEX IF NOT EXISTS sessions_open ON sessions (source, cid, channel_id, end);
+"""
+
+
+def _connect(path, readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+        if 'observed_at' not in columns:
+            # 旧版本创建的数据库
+            conn.execute("ALTER TABLE events ADD COLUMN observed_at REAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class EventJournal:
+    """
+    事件日志 - 把通道事件和配对出的观看会话追加写入 SQLite（WAL 模式）
+
+    append() 只把事件放入有界队列，写入线程成批取出并在一个事务中提交
+    （每批最多 batch_size 条，或等待 commit_interval 秒）；队列已满时丢弃新事件，
+    监控线程永远不会因磁盘写入阻塞
+    """
+
+    def __init__(self, path, max_pending=10000, batch_size=500, commit_interval=1.0):
+        """
+        Args:
+            path: 数据库文件路径
+            max_pending: 写入队列最多积压的事件批次
+            batch_size: 每次提交最多写入的事件数
+            commit_interval: 收到第一条事件后最多等待多久提交（秒）
+        """
+        self.path = str(path)
+        self._batch_size = batch_size
+        self._commit_interval = commit_interval
+        self._queue = queue.Queue(max_pending)
+        self._conn = _connect(self.path)
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, events):
+        """
+        加入一批 ChannelEvent（任意线程，不阻塞）
+
+        time 列（以及会话的开始、结束）使用日志时间戳，没有时使用当前时间；
+        observed_at 列总是记录当前时间，回放历史日志时两者可以相差很远
+        """
+        if not events:
+            return
+        now = time.time()
+        rows = [(event.time if event.time is not None else now, now, event.source,
+                 event.kind, event.cid, event.channel_id) for event in events]
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            _dropped.inc(len(rows))
+
+    def _collect(self):
+        """取出一批待写入的事件，收到关闭请求时返回 (rows, True)"""
+        rows = self._queue.get()
+        if rows is None:
+            return [], True
+        deadline = time.monotonic() + self._commit_interval
+        while len(rows) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                more = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if more is None:
+                return rows, True
+            rows = rows + more
+        return rows, False
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO events (time, observed_at, source, kind, cid, channel_id)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows)
+            for when, _, source, kind, cid, channel_id in rows:
+                if kind == CHANNEL_START:
+                    conn.execute(
+                        "INSERT INTO sessions (source, cid, channel_id, start) VALUES (?, ?, ?, ?)",
+                        (source, cid, channel_id, when))
+                else:
+                    conn.execute(
+                        "UPDATE sessions SET end = ?, duration = max(0, ? - start) WHERE id = ("
+                        " SELECT id FROM sessions WHERE source IS ? AND cid = ? AND channel_id IS ?"
+                        " AND end IS NULL ORDER BY start DESC LIMIT 1)",
+                        (when, when, source, cid, channel_id))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        _commit_seconds.observe(time.perf_counter() - started)
+        _batch_size.observe(len(rows))
+        _written.inc(len(rows))
+
+    def _run(self):
+        while True:
+            rows, closing = self._collect()
+            if rows:
+                try:
+                    self._write(rows)
+                except sqlite3.Error as e:
+                    _errors.inc(label=type(e).__name__)
+            if closing:
+                break
+        self._conn.close()
+
+    def close(self, timeout=5):
+        """写完队列中的事件后关闭"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+class JournalReader:
+    """事件日志查询（只读连接，可与写入同时进行）"""
+
+    def __init__(self, path):
+        self._conn = _connect(path, readonly=True)
+
+    def close(self):
+        self._conn.close()
+
+    def devices_between(self, start, end):
+        """
+        在 [start, end) 时间段内观看过的设备（会话与时间段有重叠，未结束的会话视为持续到现在）
+
+        Returns:
+            list[dict]: cid, sessions, first_start, last_end
+        """
+        rows = self._conn.execute(
+            "SELECT cid, count(*) AS sessions, min(start) AS first_start, max(end) AS last_end"
+            " FROM sessions WHERE start < ? AND coalesce(end, ?) >= ?"
+            " GROUP BY cid ORDER BY first_start", (end, time.time(), start))
+        return [dict(row) for row in rows]
+
+    def top_devices(self, since, limit=10):
+        """
+        since 之后开始的会话中，按观看次数排序的设备
+
+        Returns:
+            list[dict]: cid, sessions, watch_seconds
+        """
+        rows = self._conn.execute(
+            "SELECT cid, count(*) AS sessions, coalesce(sum(duration), 0) AS watch_seconds"
+            " FROM sessions WHERE start >= ? GROUP BY cid"
+            " ORDER BY sessions DESC, watch_seconds DESC LIMIT ?", (since, limit))
+        return [dict(row) for row in rows]
+
+    def sessions(self, cid=None, start=None, end=None, limit=100):
+        """按设备和时间段查询会话（新的在前）"""
+        sql = "SELECT source, cid, channel_id, start, end, duration FROM sessions WHERE 1"
+        args = []
+        if cid is not None:
+            sql += " AND cid = ?"
+            args.append(cid)
+        if start is not None:
+            sql += " AND coalesce(end, ?) >= ?"
+            args.extend((time.time(), start))
+        if end is not None:
+            sql += " AND start < ?"
+            args.append(end)
+        sql += " ORDER BY start DESC LIMIT ?"
+        args.append(limit)
+        return [dict(row) for row in self._conn.execute(sql, args)]
+
+    def events(self, cid=None, channel_id=None, start=None, end=None, limit=100):
+        """按设备、通道和时间段查询原始事件（新的在前）"""
+        sql = "SELECT time, observed_at, source, kind, cid, channel_id FROM events WHERE 1"
+        args = []
+        for column, op, value in (('cid', '=', cid), ('channel_id', '=', channel_id),
+                                  ('time', '>=', start), ('time', '<', end)):
+            if value is not None:
+                sql += f" AND {column} {op} ?"
+                args.append(value)
+        sql += " ORDER BY time DESC LIMIT ?"
+        args.append(limit)
+        return [dict(row) for row in self._conn.execute(sql, args)]
+
+
+def parse_time(text, now=None):
+    """
+    解析命令行时间："2026-10-17 20:00[:00]"、"2026-10-17" 或当天的 "20:00"
+
+    Returns:
+        float: epoch 秒
+    """
+    now = now or datetime.now()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return now.replace(hour=parsed.hour, minute=parsed.minute, second=parsed.second,
+                           microsecond=0).timestamp()
+    raise ValueError(f"无法识别的时间: {text}")
+
+
+def _format_time(value):
+    if value is None:
+        return ''
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _print_rows(rows, columns, as_json):
+    if as_json:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        return
+    print('\t'.join(columns))
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row.get(column)
+            if column in ('time', 'observed_at', 'start', 'end', 'first_start', 'last_end'):
+                value = _format_time(value)
+            elif isinstance(value, float):
+                value = f"{value:.0f}"
+            values.append('' if value is None else str(value))
+        print('\t'.join(values))
+
+
+def main():
+    """
+    python event_journal.py <数据库> devices --from 20:00 --to 23:00
+    python event_journal.py <数据库> top [--days 7] [-n 10]
+    python event_journal.py <数据库> sessions|events [--cid 设备号] [--from ...] [--to ...]
+    """
+    parser = argparse.ArgumentParser(description="查询通道事件日志")
+    parser.add_argument('database')
+    parser.add_argument('--json', action='store_true', help="每行输出一个 JSON 对象")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    devices = commands.add_parser('devices', help="时间段内观看过的设备")
+    devices.add_argument('--from', dest='start', required=True)
+    devices.add_argument('--to', dest='end', required=True)
+
+    top = commands.add_parser('top', help="观看次数最多的设备")
+    top.add_argument('--days', type=float, default=7)
+    top.add_argument('-n', '--limit', type=int, default=10)
+
+    for name in ('sessions', 'events'):
+        sub = commands.add_parser(name, help="会话" if name == 'sessions' else "原始事件")
+        sub.add_argument('--cid')
+        sub.add_argument('--from', dest='start')
+        sub.add_argument('--to', dest='end')
+        sub.add_argument('-n', '--limit', type=int, default=100)
+
+    args = parser.parse_args()
+    try:
+        reader = JournalReader(args.database)
+        if args.command == 'devices':
+            rows = reader.devices_between(parse_time(args.start), parse_time(args.end))
+            columns = ['cid', 'sessions', 'first_start', 'last_end']
+        elif args.command == 'top':
+            since = (datetime.now() - timedelta(days=args.days)).timestamp()
+            rows = reader.top_devices(since, args.limit)
+            columns = ['cid', 'sessions', 'watch_seconds']
+        else:
+            start = parse_time(args.start) if args.start else None
+            end = parse_time(args.end) if args.end else None
+            if args.command == 'sessions':
+                rows = reader.sessions(args.cid, start, end, args.limit)
+                columns = ['source', 'cid', 'channel_id', 'start', 'end', 'duration']
+            else:
+                rows = reader.events(args.cid, None, start, end, args.limit)
+                columns = ['time', 'observed_at', 'source', 'kind', 'cid', 'channel_id']
+        reader.close()
+    except (ValueError, sqlite3.Error) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    _print_rows(rows, columns, args.json)
+
+
+if __name__ == "__main__":
+    main()
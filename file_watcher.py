@@ -0,0 +1,334 @@
+import os
+import sys
+import time
+import select
+import struct
+import threading
+
+from config_loader import config
+from scheduler import Backoff
+
+
+class PollingWatcher:
+    """
+    轮询模式 - 比较文件大小和修改时间（兜底方案）
+
+    检测到变化后按 monitor.check_interval 轮询，空闲时间隔逐步放大到 monitor.poll_interval_max
+    """
+
+    def __init__(self, interval=None, max_interval=None):
+        interval = interval or config.get('monitor.check_interval', 0.2)
+        self._backoff = Backoff(interval, max_interval or config.get('monitor.poll_interval_max', 1))
+        self._paths = {}
+        self._wake = threading.Event()
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def add(self, path):
+        """添加监视的文件（文件可以尚不存在）"""
+        self._paths[path] = self._signature(path)
+
+    def remove(self, path):
+        self._paths.pop(path, None)
+
+    def retry_pending(self):
+        """轮询模式直接比较文件，没有需要重试的目录"""
+        return False
+
+    def wait(self, timeout=None):
+        """
+        阻塞直到任一文件变化或超时
+
+        Returns:
+            bool: 是否检测到变化（超时或被唤醒返回 False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            interval = self._backoff.next()
+            if deadline is not None:
+                interval = min(interval, max(0.0, deadline - time.monotonic()))
+            if self._wake.wait(interval):
+                self._wake.clear()
+                return False
+
+            changed = False
+            for path, old in self._paths.items():
+                new = self._signature(path)
+                if new != old:
+                    self._paths[path] = new
+                    changed = True
+            if changed:
+                self._backoff.reset()
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def wakeup(self):
+        """从其他线程唤醒阻塞中的 wait()"""
+        self._wake.set()
+
+    def close(self):
+        self._paths.clear()
+
+
+class InotifyWatcher:
+    """Linux inotify 模式 - 监视日志所在目录，文件无变化时线程完全阻塞"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    _MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+             | IN_CREATE | IN_DELETE)
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+
+        self._wake_r, self._wake_w = os.pipe()
+        self._dirs = {}        # 目录 -> 该目录下被监视的文件名集合
+        self._wd_to_dir = {}   # watch descriptor -> 目录
+        self._pending = set()  # 尚不存在、稍后重试的目录
+        self._retry_interval = config.get('monitor.file_wait_interval', 3)
+
+    def _add_dir(self, directory):
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), self._MASK)
+        if wd < 0:
+            self._pending.add(directory)
+            return False
+        self._pending.discard(directory)
+        self._wd_to_dir[wd] = directory
+        return True
+
+    def retry_pending(self):
+        """
+        重新尝试监视之前不存在的目录
+
+        Returns:
+            bool: 是否有目录刚开始被监视（其中的文件可能已经存在）
+        """
+        added = False
+        for directory in list(self._pending):
+            if self._add_dir(directory):
+                added = True
+        return added
+
+    def add(self, path):
+        """添加监视的文件（文件可以尚不存在，目录不存在时稍后重试）"""
+        directory, name = os.path.split(os.path.abspath(path))
+        if directory not in self._dirs:
+            self._dirs[directory] = set()
+            self._add_dir(directory)
+        self._dirs[directory].add(name)
+
+    def remove(self, path):
+        directory, name = os.path.split(os.path.abspath(path))
+        self._dirs.get(directory, set()).discard(name)
+
+    def fileno(self):
+        """inotify 描述符，可注册到 select / asyncio 事件循环"""
+        return self._fd
+
+    def read_events(self):
+        """读取全部待处理事件（非阻塞），返回是否涉及被监视的文件"""
+        hit = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return hit
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                directory = self._wd_to_dir.get(wd)
+                if directory is not None and os.fsdecode(name) in self._dirs.get(directory, ()):
+                    hit = True
+
+    def wait(self, timeout=None):
+        """
+        阻塞直到任一文件变化或超时
+
+        Returns:
+            bool: 是否检测到变化（超时或被唤醒返回 False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.retry_pending():
+                # 目录刚出现，其中的文件可能已经存在
+                return True
+
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._pending:
+                remaining = self._retry_interval if remaining is None else min(remaining, self._retry_interval)
+
+            readable, _, _ = select.select([self._fd, self._wake_r], [], [], remaining)
+            if self._wake_r in readable:
+                os.read(self._wake_r, 512)
+                return False
+            if self._fd in readable and self.read_events():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def wakeup(self):
+        """从其他线程唤醒阻塞中的 wait()"""
+        os.write(self._wake_w, b'\0')
+
+    def close(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class WindowsWatcher:
+    """Windows 目录变更通知模式 - 基于 FindFirstChangeNotification 句柄等待"""
+
+    FILE_NOTIFY_CHANGE_FILE_NAME = 0x00000001
+    FILE_NOTIFY_CHANGE_SIZE = 0x00000008
+    FILE_NOTIFY_CHANGE_LAST_WRITE = 0x00000010
+    WAIT_OBJECT_0 = 0
+    WAIT_TIMEOUT = 0x102
+    INFINITE = 0xFFFFFFFF
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._kernel32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+        self._kernel32.FindFirstChangeNotificationW.argtypes = [
+            wintypes.LPCWSTR, wintypes.BOOL, wintypes.DWORD]
+        self._kernel32.CreateEventW.restype = wintypes.HANDLE
+        self._kernel32.WaitForMultipleObjects.argtypes = [
+            wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD]
+        for func in ('FindNextChangeNotification', 'FindCloseChangeNotification',
+                     'SetEvent', 'CloseHandle'):
+            getattr(self._kernel32, func).argtypes = [wintypes.HANDLE]
+        self._handle_type = wintypes.HANDLE
+        self._invalid_handle = ctypes.c_void_p(-1).value
+
+        self._wake_event = self._kernel32.CreateEventW(None, False, False, None)
+        self._handles = {}     # 目录 -> 变更通知句柄
+        self._pending = set()
+        self._retry_interval = config.get('monitor.file_wait_interval', 3)
+
+    def _add_dir(self, directory):
+        handle = self._kernel32.FindFirstChangeNotificationW(
+            directory, False,
+            self.FILE_NOTIFY_CHANGE_FILE_NAME
+            | self.FILE_NOTIFY_CHANGE_SIZE
+            | self.FILE_NOTIFY_CHANGE_LAST_WRITE)
+        if handle is None or handle == self._invalid_handle:
+            self._pending.add(directory)
+            return False
+        self._pending.discard(directory)
+        self._handles[directory] = handle
+        return True
+
+    def retry_pending(self):
+        """
+        重新尝试监视之前不存在的目录
+
+        Returns:
+            bool: 是否有目录刚开始被监视（其中的文件可能已经存在）
+        """
+        added = False
+        for directory in list(self._pending):
+            if self._add_dir(directory):
+                added = True
+        return added
+
+    def add(self, path):
+        """添加监视的文件（按目录监视，目录不存在时稍后重试）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory not in self._handles:
+            self._add_dir(directory)
+
+    def remove(self, path):
+        pass
+
+    def wait(self, timeout=None):
+        """
+        阻塞直到目录内发生变化或超时
+
+        Returns:
+            bool: 是否检测到变化（超时或被唤醒返回 False）
+        """
+        if self.retry_pending():
+            return True
+
+        if self._pending:
+            timeout = self._retry_interval if timeout is None else min(timeout, self._retry_interval)
+
+        dirs = list(self._handles)
+        handles = [self._wake_event] + [self._handles[d] for d in dirs]
+        array = (self._handle_type * len(handles))(*handles)
+        millis = self.INFINITE if timeout is None else int(timeout * 1000)
+
+        result = self._kernel32.WaitForMultipleObjects(len(handles), array, False, millis)
+        index = result - self.WAIT_OBJECT_0
+        if 1 <= index < len(handles):
+            self._kernel32.FindNextChangeNotification(handles[index])
+            return True
+        return False
+
+    def wakeup(self):
+        """从其他线程唤醒阻塞中的 wait()"""
+        self._kernel32.SetEvent(self._wake_event)
+
+    def close(self):
+        for handle in self._handles.values():
+            self._kernel32.FindCloseChangeNotification(handle)
+        self._handles.clear()
+        self._kernel32.CloseHandle(self._wake_event)
+
+
+def create_watcher(backend=None):
+    """
+    按配置创建文件变更监视器
+
+    Args:
+        backend: "auto" / "inotify" / "windows" / "polling"，默认读取 monitor.watcher
+    """
+    backend = backend or config.get('monitor.watcher', 'auto')
+
+    if backend == 'auto':
+        if sys.platform.startswith('linux'):
+            backend = 'inotify'
+        elif sys.platform == 'win32':
+            backend = 'windows'
+        else:
+            backend = 'polling'
+
+    try:
+        if backend == 'inotify':
+            return InotifyWatcher()
+        if backend == 'windows':
+            return WindowsWatcher()
+    except (OSError, AttributeError, ImportError):
+        pass
+
+    return PollingWatcher()
@@ -0,0 +1,219 @@
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from config_loader import config
+
+
+DEFAULT_PATTERNS = {
+    'channel_create': r'Create Channel PeerCid is (\d+), ServiceID is \d+, ChanId\[(\d+)\]',
+    'channel_end': r'PeerCid is (\d+).*?ChanId\[(\d+)\]',
+    'end_keywords': ['TEARDOWN_REQ', 'Channel Closed'],
+}
+
+CHANNEL_START = 'start'
+CHANNEL_END = 'end'
+
+# 匹配到的通道事件：kind 为 CHANNEL_START / CHANNEL_END，source 为监控源名称，
+# time 为日志行中的时间戳（epoch 秒，按 patterns.timestamp 解析，行中没有时间戳时为 None）
+ChannelEvent = namedtuple('ChannelEvent', ['kind', 'cid', 'channel_id', 'source', 'time'],
+                          defaults=(None, None))
+
+
+def literal_prefix(pattern):
+    """
+    提取正则开头的固定文本，用作预过滤关键字
+
+    无法安全提取（含分支、标志、开头即元字符）时返回空字符串
+    """
+    if '|' in pattern or pattern.startswith('(?'):
+        return ''
+
+    literal = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            literal.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch in '.^$*+?{}[]()':
+            # 量词作用于前一个字符，该字符不再是必需的
+            if ch in '*?{' and literal:
+                literal.pop()
+            break
+        literal.append(ch)
+        i += 1
+    return ''.join(literal)
+
+
+class LineMatcher:
+    """
+    日志行匹配器 - 由配置中的 patterns 编译
+
+    先用 bytes.find 在整块数据上逐个定位关键字（比分支正则快数倍），
+    只对包含关键字的候选行执行带捕获组的正则。
+    """
+
+    def __init__(self, patterns=None, encoding='utf-8', regexes=None):
+        """
+        Args:
+            patterns: patterns 配置字典，默认读取 config.json
+            encoding: 日志编码
+            regexes: 已编译的正则（load_sources() 结果中的 regexes），与 patterns 一致的直接使用
+        """
+        if patterns is None:
+            patterns = config.get('patterns', {})
+            regexes = config.snapshot.regexes
+        regexes = regexes or {}
+
+        def compiled(name, text):
+            regex = regexes.get(name)
+            return regex if regex is not None and regex.pattern == text else re.compile(text)
+
+        create = patterns.get('channel_create', DEFAULT_PATTERNS['channel_create'])
+        end = patterns.get('channel_end', DEFAULT_PATTERNS['channel_end'])
+
+        self._encoding = encoding
+        self._end_keywords = list(patterns.get('end_keywords', DEFAULT_PATTERNS['end_keywords']))
+        self._create_keywords = list(patterns.get('create_keywords') or
+                                     filter(None, [literal_prefix(create)]))
+
+        self._re_create = compiled('channel_create', create)
+        self._re_end = compiled('channel_end', end)
+        self._re_create_b = re.compile(create.encode(encoding))
+        self._re_end_b = re.compile(end.encode(encoding))
+        self._end_keywords_b = [kw.encode(encoding) for kw in self._end_keywords]
+        self._create_keywords_b = [kw.encode(encoding) for kw in self._create_keywords]
+
+        # 可选：从匹配行中提取时间戳（只对匹配到事件的行执行），未配置或为空字符串时不提取
+        timestamp = patterns.get('timestamp')
+        self._re_time_b = re.compile(timestamp.encode(encoding)) if timestamp else None
+        self._time_format = patterns.get('timestamp_format', '%Y-%m-%d %H:%M:%S.%f')
+        # 格式以 .%f 结尾时按整秒部分缓存解析结果，同一秒内的行只调用一次 strptime
+        self._time_format_seconds = (self._time_format[:-3] if self._time_format.endswith('.%f')
+                                     else None)
+        self._time_cache = {}
+
+        # 没有开始关键字时每一行都可能匹配，无法预过滤
+        self._prefilter = None
+        if self._create_keywords_b:
+            self._prefilter = sorted(set(self._create_keywords_b + self._end_keywords_b))
+
+    def match_line(self, line):
+        """
+        匹配单行文本
+
+        Returns:
+            ChannelEvent 或 None
+        """
+        if not self._create_keywords or any(kw in line for kw in self._create_keywords):
+            match = self._re_create.search(line)
+            if match:
+                return ChannelEvent(CHANNEL_START, match.group(1), match.group(2))
+
+        if any(kw in line for kw in self._end_keywords):
+            match = self._re_end.search(line)
+            if match:
+                return ChannelEvent(CHANNEL_END, match.group(1), match.group(2))
+        return None
+
+    def _match_bytes(self, line):
+        if not self._create_keywords_b or any(kw in line for kw in self._create_keywords_b):
+            match = self._re_create_b.search(line)
+            if match:
+                return ChannelEvent(CHANNEL_START, self._decode(match.group(1)),
+                                    self._decode(match.group(2)), time=self._timestamp(line))
+
+        if any(kw in line for kw in self._end_keywords_b):
+            match = self._re_end_b.search(line)
+            if match:
+                return ChannelEvent(CHANNEL_END, self._decode(match.group(1)),
+                                    self._decode(match.group(2)), time=self._timestamp(line))
+        return None
+
+    def _decode(self, raw):
+        return raw.decode(self._encoding, errors='ignore')
+
+    def _timestamp(self, line):
+        """按 patterns.timestamp（第一个捕获组）和 timestamp_format 解析行时间，失败返回 None"""
+        if self._re_time_b is None:
+            return None
+        match = self._re_time_b.search(line)
+        if not match:
+            return None
+        text = self._decode(match.group(1))
+        try:
+            if self._time_format_seconds is not None:
+                seconds, _, fraction = text.rpartition('.')
+                if seconds and fraction.isdigit() and len(fraction) <= 6:
+                    base = self._time_cache.get(seconds)
+                    if base is None:
+                        base = datetime.strptime(seconds, self._time_format_seconds).timestamp()
+                        if len(self._time_cache) >= 4096:
+                            self._time_cache.clear()
+                        self._time_cache[seconds] = base
+                    # 与 %f 相同：小数部分右侧补零到微秒
+                    return base + int(fraction.ljust(6, '0')) / 1e6
+            return datetime.strptime(text, self._time_format).timestamp()
+        except ValueError:
+            return None
+
+    def scan(self, chunk):
+        """
+        扫描一整块完整行数据（LogTailer.read() 的返回值）
+
+        Returns:
+            list[ChannelEvent]: 按出现顺序排列的事件
+        """
+        events = []
+        if not chunk:
+            return events
+
+        if self._prefilter is None:
+            for line in chunk.split(b'\n'):
+                event = self._match_bytes(line)
+                if event:
+                    events.append(event)
+            return events
+
+        # 每个关键字各自在整块上查找（C 实现的子串搜索），记录所在行的起点；
+        # 一行命中后直接跳到下一行，同一行含多个关键字时只记录一次
+        find = chunk.find
+        rfind = chunk.rfind
+        starts = set()
+        for keyword in self._prefilter:
+            pos = find(keyword)
+            while pos >= 0:
+                starts.add(rfind(b'\n', 0, pos) + 1)
+                end = find(b'\n', pos)
+                if end < 0:
+                    break
+                pos = find(keyword, end + 1)
+
+        for start in sorted(starts):
+            end = find(b'\n', start)
+            if end < 0:
+                end = len(chunk)
+            event = self._match_bytes(chunk[start:end])
+            if event:
+                events.append(event)
+        return events
+
+    def open_channels(self, blocks):
+        """
+        由倒序数据块重建当前仍处于打开状态的通道
+
+        Args:
+            blocks: 最新在前的完整行数据块（如 read_blocks_reverse() 的结果）
+
+        Returns:
+            set[str]: "cid_channel_id" 形式的通道键
+        """
+        last_kind = {}
+        for block in blocks:
+            for event in reversed(self.scan(block)):
+                last_kind.setdefault(f"{event.cid}_{event.channel_id}", event.kind)
+        return {key for key, kind in last_kind.items() if kind == CHANNEL_START}
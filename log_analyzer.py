@@ -0,0 +1,243 @@
+import os
+import sys
+import csv
+import glob
+import json
+import mmap
+import time
+import argparse
+from multiprocessing import Pool
+
+from config_loader import config
+from line_matcher import LineMatcher, CHANNEL_START
+from log_finder import LogIndex
+
+
+SESSION_FIELDS = ['file', 'cid', 'channel_id', 'start', 'end', 'duration']
+
+# 工作进程内的匹配器（由 _init_worker 创建，每个进程编译一次）
+_matcher = None
+
+
+def _init_worker(patterns):
+    global _matcher
+    _matcher = LineMatcher(patterns)
+
+
+def _scan_segment(task):
+    """
+    扫描文件中 [start, end) 一段（边界已对齐到行首），在工作进程中执行
+
+    Returns:
+        list[tuple]: (kind, cid, channel_id, time)，按出现顺序
+    """
+    path, start, end, chunk_size = task
+    events = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            limit = min(pos + chunk_size, end)
+            if limit < end:
+                cut = mm.rfind(b'\n', pos, limit)
+                # 超长行：整行放入本块
+                limit = cut + 1 if cut >= pos else end
+            for event in _matcher.scan(mm[pos:limit]):
+                events.append((event.kind, event.cid, event.channel_id, event.time))
+            pos = limit
+    return events
+
+
+def split_file(path, segment_size):
+    """
+    把文件切分为按行对齐的若干段
+
+    Returns:
+        list[(start, end)]
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    bounds = [0]
+    with open(path, 'rb') as f:
+        offset = segment_size
+        while offset < size:
+            f.seek(offset)
+            f.readline()
+            boundary = f.tell()
+            if boundary >= size:
+                break
+            if boundary > bounds[-1]:
+                bounds.append(boundary)
+            offset = boundary + segment_size
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def collect_files(paths, pattern=None):
+    """
+    展开目录（按 log.pattern 匹配）和通配符，按日志编号排序
+
+    Returns:
+        list[str]
+    """
+    pattern = pattern or config.get('log.pattern', 'ich_run_*.log')
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, pattern)))
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path))
+        elif os.path.isfile(path):
+            files.append(path)
+
+    def order(path):
+        number = LogIndex(os.path.dirname(path), pattern).number_of(path)
+        return (os.path.dirname(path), -1 if number is None else number, path)
+
+    return sorted(set(files), key=order)
+
+
+class SessionBuilder:
+    """按文件顺序把事件配对为会话（与实时监控相同的去重规则）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._open = {}
+
+    def feed(self, events):
+        """
+        Returns:
+            list[dict]: 本批结束的会话
+        """
+        sessions = []
+        for kind, cid, channel_id, when in events:
+            key = (cid, channel_id)
+            if kind == CHANNEL_START:
+                self._open.setdefault(key, when)
+                continue
+            if key not in self._open:
+                continue
+            sessions.append(self._session(cid, channel_id, self._open.pop(key), when))
+        return sessions
+
+    def finish(self):
+        """文件结束时仍未结束的会话（end 为空）"""
+        sessions = [self._session(cid, channel_id, start, None)
+                    for (cid, channel_id), start in self._open.items()]
+        self._open.clear()
+        return sessions
+
+    def _session(self, cid, channel_id, start, end):
+        duration = end - start if start is not None and end is not None else None
+        return {'file': self.path, 'cid': cid, 'channel_id': channel_id,
+                'start': start, 'end': end, 'duration': duration}
+
+
+class SessionWriter:
+    """会话输出：csv 或 jsonl"""
+
+    def __init__(self, stream, fmt='csv'):
+        self._stream = stream
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=SESSION_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, sessions):
+        for session in sessions:
+            if self._csv is not None:
+                self._csv.writerow(session)
+            else:
+                self._stream.write(json.dumps(session, ensure_ascii=False) + '\n')
+
+
+def analyze(files, writer, workers=None, segment_size=256 * 1024 * 1024,
+            chunk_size=16 * 1024 * 1024, patterns=None):
+    """
+    并行扫描日志文件并输出会话
+
+    大文件按 segment_size 切分为多段并行扫描，结果按文件和段的顺序依次配对，
+    同一通道跨段的开始 / 结束也能正确配对
+
+    Returns:
+        dict: files, bytes, sessions, events, untimed（无法解析时间戳的事件数）
+    """
+    if patterns is None:
+        patterns = config.get('patterns', {})
+
+    tasks = []
+    owners = []
+    for path in files:
+        try:
+            segments = split_file(path, segment_size)
+        except OSError:
+            continue
+        for start, end in segments:
+            tasks.append((path, start, end, chunk_size))
+            owners.append(path)
+
+    stats = {'files': len(set(owners)), 'bytes': sum(end - start for _, start, end, _ in tasks),
+             'sessions': 0, 'events': 0, 'untimed': 0}
+    builder = None
+    with Pool(workers, initializer=_init_worker, initargs=(patterns,)) as pool:
+        for path, events in zip(owners, pool.imap(_scan_segment, tasks)):
+            if builder is None or builder.path != path:
+                if builder is not None:
+                    sessions = builder.finish()
+                    writer.write(sessions)
+                    stats['sessions'] += len(sessions)
+                builder = SessionBuilder(path)
+            stats['events'] += len(events)
+            stats['untimed'] += sum(1 for event in events if event[3] is None)
+            sessions = builder.feed(events)
+            writer.write(sessions)
+            stats['sessions'] += len(sessions)
+    if builder is not None:
+        sessions = builder.finish()
+        writer.write(sessions)
+        stats['sessions'] += len(sessions)
+    return stats
+
+
+def main():
+    """python log_analyzer.py <目录|通配符|文件>... [-f csv|jsonl] [-o 输出文件]"""
+    parser = argparse.ArgumentParser(description="离线分析历史日志，提取通道观看会话")
+    parser.add_argument('paths', nargs='+', help="日志目录、通配符或文件")
+    parser.add_argument('-f', '--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('-o', '--output', help="输出文件，默认标准输出")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument('--segment-mb', type=int, default=256, help="大文件切分大小（MB）")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("没有找到日志文件", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    if args.output:
+        stream = open(args.output, 'w', encoding='utf-8', newline='')
+    else:
+        stream = sys.stdout
+    try:
+        stats = analyze(files, SessionWriter(stream, args.format), args.workers,
+                        args.segment_mb * 1024 * 1024)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{stats['files']} 个文件，{stats['bytes'] / 1024 / 1024:.1f} MB，"
+          f"{stats['sessions']} 个会话，耗时 {elapsed:.1f} 秒"
+          f"（{stats['bytes'] / 1024 / 1024 / max(elapsed, 1e-6):.0f} MB/s）", file=sys.stderr)
+    if stats['untimed'] and not config.get('patterns.timestamp'):
+        print("警告：未配置 patterns.timestamp，会话的开始、结束时间和时长为空；"
+              "请按日志行的时间格式配置 patterns.timestamp / timestamp_format", file=sys.stderr)
+    elif stats['untimed']:
+        print(f"警告：{stats['events']} 个事件中有 {stats['untimed']} 个无法解析时间戳，"
+              f"对应会话的开始、结束时间和时长为空；请检查 patterns.timestamp / timestamp_format "
+              f"是否与日志格式一致", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,107 @@
 import os
 import re
-import glob
 from pathlib import Path
 
 from config_loader import config
 
 
+class LogIndex:
+    """
+    日志目录索引 - 增量维护编号最大的日志文件
+    
+    启动时遍历一次目录；之后只检查"下一个编号"的文件是否出现，
+    不再重新遍历和排序整个目录
+    """
+    
+    # 日志程序偶尔会跳过编号，向后多探测几个
+    PROBE_AHEAD = 3
+    
+    def __init__(self, directory, pattern=None):
+        """
+        Args:
+            directory: 日志目录
+            pattern: 文件名模式（含一个 *），默认读取 log.pattern
+        """
+        self.directory = directory
+        pattern = pattern or config.get('log.pattern', 'ich_run_*.log')
+        self._prefix, _, self._suffix = pattern.partition('*')
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        self._number_regex = re.compile(
+            re.escape(self._prefix) + r'(\d+)' + re.escape(self._suffix) + '$', flags)
+        self.latest_number = None
+        self.latest_path = None
+    
+    def number_of(self, path):
+        """提取日志文件编号，不匹配时返回 None"""
+        match = self._number_regex.match(os.path.basename(path))
+        return int(match.group(1)) if match else None
+    
+    def path_for(self, number):
+        """指定编号的日志文件路径"""
+        return os.path.join(self.directory, f"{self._prefix}{number}{self._suffix}")
+    
+    def next_path(self):
+        """下一个编号的日志路径（用于监视其创建事件）"""
+        return self.path_for(0 if self.latest_number is None else self.latest_number + 1)
+    
+    def scan(self):
+        """遍历目录一次，找出编号最大的日志文件"""
+        try:
+            entries = os.scandir(self.directory)
+        except OSError:
+            return self.latest_path
+        
+        with entries:
+            for entry in entries:
+                number = self.number_of(entry.name)
+                if number is not None and (self.latest_number is None or number > self.latest_number):
+                    self.latest_number = number
+                    self.latest_path = entry.path
+        return self.latest_path
+    
+    def on_created(self, path):
+        """
+        处理新文件创建事件
+        
+        Returns:
+            bool: 最新日志是否变化
+        """
+        number = self.number_of(path)
+        if number is None or (self.latest_number is not None and number <= self.latest_number):
+            return False
+        self.latest_number = number
+        self.latest_path = self.path_for(number)
+        return True
+    
+    def refresh(self):
+        """
+        检查是否出现了编号更大的日志（只检查后续几个编号）
+        
+        Returns:
+            bool: 最新日志是否变化
+        """
+        changed = False
+        start = 0 if self.latest_number is None else self.latest_number + 1
+        number = start
+        while number < start + self.PROBE_AHEAD:
+            if os.path.isfile(self.path_for(number)):
+                changed = self.on_created(self.path_for(number)) or changed
+                start = number + 1
+            number += 1
+        return changed
+
+
 class LogFinder:
     """查找和管理日志文件路径"""
     
-    def __init__(self):
-        self._pattern = config.get('log.pattern', 'ich_run_*.log')
-        self._number_regex = re.compile(r'ich_run_(\d+)\.log')
+    def __init__(self, pattern=None, backup_paths=None):
+        """
+        Args:
+            pattern: 日志文件名模式，默认读取 log.pattern
+            backup_paths: 备用日志路径列表，默认读取 log.backup_paths
+        """
+        self._pattern = pattern or config.get('log.pattern', 'ich_run_*.log')
+        self._backup_paths = backup_paths
     
     def find_latest(self, log_dir=None):
         """
@@ -25,19 +115,7 @@ class LogFinder:
         if not os.path.exists(directory):
             return None
         
-        search_pattern = os.path.join(directory, self._pattern)
-        log_files = glob.glob(search_pattern)
-        
-        if not log_files:
-            return None
-        
-        def _extract_number(filepath):
-            filename = os.path.basename(filepath)
-            match = self._number_regex.search(filename)
-            return int(match.group(1)) if match else 0
-        
-        log_files.sort(key=_extract_number, reverse=True)
-        return log_files[0]
+        return LogIndex(directory, self._pattern).scan()
     
     def find_with_fallback(self, log_dir=None):
         """
@@ -49,7 +127,9 @@ class LogFinder:
             return latest
         
         # 尝试备用路径
-        backup_paths = config.get('log.backup_paths', [])
+        backup_paths = self._backup_paths
+        if backup_paths is None:
+            backup_paths = config.get('log.backup_paths', [])
         for path in backup_paths:
             if os.path.isfile(path):
                 return path
@@ -1,93 +1,360 @@
 import os
-import re
+import sys
 import time
-from datetime import datetime
 
-from config_loader import config
-from toast_notifier import ToastNotifier
+from config_loader import config, load_sources
+from log_tailer import LogTailer, read_blocks_reverse
+from log_finder import LogIndex
+from line_matcher import LineMatcher, CHANNEL_START
+from file_watcher import create_watcher
+from checkpoint import Checkpoint
+from channel_store import ChannelStore
+from notification_sinks import create_sinks, dispatch
+from metrics import metrics, start_metrics
+
+
+_reads = metrics.counter('log_reads_total', "日志读取检查次数（每次一次 stat）")
+_read_bytes = metrics.counter('log_read_bytes_total', "读取的日志字节数")
+_read_lines = metrics.counter('log_read_lines_total', "读取的日志行数")
+_read_seconds = metrics.histogram('log_read_seconds', "单次读取耗时")
+_match_seconds = metrics.histogram('match_seconds', "单次读取内容的匹配耗时")
+_events = metrics.counter('channel_events_total', "改变通道状态的事件数", label='kind')
+_duplicates = metrics.counter('channel_duplicates_total', "被去重的事件数", label='kind')
+_switches = metrics.counter('log_switches_total', "日志轮转或切换到新文件的次数")
+_errors = metrics.counter('errors_total', "按类型统计的异常次数", label='type')
 
 
 class LogMonitor:
-    """日志监控器 - 定期读取模式"""
-    
-    def __init__(self, log_path, notifier=None):
+    """
+    日志监控器 - 单个监控源的增量读取、匹配与去重
+
+    可以独立运行（_check_cycle 循环），也可以由 MonitorEngine 与其他
+    监控源共享一个文件变更监视器
+    """
+
+    def __init__(self, log_path, sinks=None, source=None, watcher=None, checkpoint_path=None):
+        """
+        Args:
+            log_path: 日志路径，为 None 时处于暂停状态，等待 resume()
+            sinks: 独立运行时使用的通知输出列表，默认按 notification.sinks 创建
+            source: 监控源配置（load_sources() 的元素），默认第一个监控源
+            watcher: 共享的文件变更监视器，默认自行创建
+            checkpoint_path: 检查点文件路径，默认读取 monitor.checkpoint_path
+        """
+        self.source = source or load_sources()[0]
+        self.name = self.source['name']
         self.log_path = log_path
-        self.notifier = notifier or ToastNotifier()
-        self._notified_events = set()
-        self._last_position = 0
-        self._last_size = 0
-        self._running = False
-        
+        self.sinks = sinks
+        self.active = log_path is not None
+        self.has_more = False
+        self.missing = False
+        self.idle = True
+        self._notified_events = ChannelStore()
+        self._tailer = LogTailer(log_path) if log_path else None
+        self._index = None
+        self._restored = False
+        self._watcher = watcher or create_watcher()
+        self._checkpoint = Checkpoint(checkpoint_path, key=self.name)
+        self._matcher = LineMatcher(self.source['patterns'], regexes=self.source.get('regexes'))
+        self._saved_position = None
+        self._last_save = time.monotonic()
+
         # 从配置加载参数
-        self._check_interval = config.get('monitor.check_interval', 0.2)
-        self._file_wait = config.get('monitor.file_wait_interval', 3)
-        
-        # 编译正则表达式
-        patterns = config.get('patterns', {})
-        self._re_create = re.compile(patterns.get('channel_create', 
-            r'Create Channel PeerCid is (\d+), ServiceID is \d+, ChanId\[(\d+)\]'))
-        self._re_end = re.compile(patterns.get('channel_end',
-            r'PeerCid is (\d+).*?ChanId\[(\d+)\]'))
-        self._end_keywords = patterns.get('end_keywords', ['TEARDOWN_REQ', 'Channel Closed'])
-        
-        # 通知模板
-        self._notify_title = config.get('notification.title', '请注意')
-    
-    def _read_new_lines(self):
-        """原子读取新增内容"""
+        self._load_settings(config)
+
+        if self.active:
+            self._activate()
+
+    def _load_settings(self, cfg):
+        self._check_interval = cfg.get('monitor.check_interval', 0.2)
+        self._file_wait = cfg.get('monitor.file_wait_interval', 3)
+        self._watch_timeout = cfg.get('monitor.watch_timeout', 2)
+        self._checkpoint_interval = cfg.get('monitor.checkpoint_interval', 10)
+        self._notified_events.set_limits(cfg.get('monitor.channel_ttl', 43200),
+                                         cfg.get('monitor.channel_max', 10000))
+
+    def apply_config(self, snapshot, patterns=None, regexes=None):
+        """
+        切换到新的配置快照（热重载）：更新匹配规则和时间参数，
+        读取位置、文件监视和通道状态保持不变
+
+        Args:
+            snapshot: ConfigSnapshot
+            patterns: 本监控源的 patterns，为 None 时不更换匹配规则
+            regexes: patterns 中已编译的正则（load_sources() 已校验）
+        """
+        if patterns is not None and patterns != self.source['patterns']:
+            self.source = dict(self.source, patterns=patterns, regexes=regexes)
+            self._matcher = LineMatcher(patterns, regexes=regexes)
+        self._load_settings(snapshot)
+
+    @property
+    def active_channels(self):
+        """当前处于打开状态的通道键（ChannelStore，超时未结束的通道会被淘汰）"""
+        return self._notified_events
+
+    def _activate(self):
+        """开始（或重新开始）监视当前日志"""
+        if not self._restored:
+            self._restored = True
+            self._restore_position()
+        self._watcher.add(self.log_path)
+        self._watch_index(self.log_path)
+
+    def _restore_position(self):
+        """首次启动时恢复读取位置：优先使用检查点，否则按 monitor.start_position"""
+        state = self._checkpoint.restore(self.log_path)
+        if state is not None:
+            offset, active = state
+            self._tailer.seek(offset)
+            self._notified_events.update(active)
+        else:
+            start_position = config.get('monitor.start_position', 'begin')
+            if start_position in ('end', 'scan'):
+                try:
+                    end = self._tailer.seek_end()
+                    if start_position == 'scan':
+                        # 倒序扫描末尾一段日志，重建仍在观看的通道
+                        blocks = read_blocks_reverse(
+                            self.log_path, end,
+                            max_bytes=int(config.get('monitor.tail_scan_bytes', 8 * 1024 * 1024)))
+                        self._notified_events.update(self._matcher.open_channels(blocks))
+                except OSError:
+                    pass
+        self._saved_position = self._tailer.position
+
+    def _watch_index(self, log_path):
+        """为日志所在目录建立索引，并监视下一个编号文件的创建"""
+        if self._index is not None:
+            self._watcher.remove(self._index.next_path())
+
+        index = LogIndex(os.path.dirname(log_path), self.source['pattern'])
+        if index.number_of(log_path) is None:
+            # 备用路径等非编号日志，不做自动跟随
+            self._index = None
+            return
+        index.on_created(log_path)
+        self._index = index
+        self._watcher.add(index.next_path())
+
+    def _follow(self, path):
+        """切换到新的日志文件，从头读取"""
+        if self.log_path:
+            self._watcher.remove(self.log_path)
+        self._watcher.add(path)
+        self.log_path = path
+        self._tailer = LogTailer(path)
+        self._notified_events.clear()
+        self._watch_index(path)
+        _switches.inc()
+
+    def pause(self):
+        """目标进程退出：停止读取并取消文件监视"""
+        if not self.active:
+            return
+        self.active = False
+        self._watcher.remove(self.log_path)
+        if self._index is not None:
+            self._watcher.remove(self._index.next_path())
+
+    def resume(self, log_path):
+        """目标进程启动：切换到最新日志，同一文件保留读取偏移"""
+        if log_path != self.log_path:
+            if self._tailer is None:
+                self.log_path = log_path
+                self._tailer = LogTailer(log_path)
+            else:
+                self._restored = True
+                self._follow(log_path)
+        self.active = True
+        self._activate()
+
+    def poll(self):
+        """
+        读取新增的完整行并匹配，只返回改变通道状态的事件
+
+        Returns:
+            list[ChannelEvent]
+        """
+        self.has_more = False
+        self.idle = True
+        started = time.perf_counter()
+        _reads.inc()
         try:
-            with open(self.log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                f.seek(self._last_position)
-                lines = f.readlines()
-                self._last_position = f.tell()
-                return lines
-        except PermissionError:
-            time.sleep(0.5)
-            return []
-        except Exception as e:
+            chunk = self._tailer.read()
+        except FileNotFoundError:
+            self.missing = True
             return []
-    
-    def _handle_rotation(self, current_size):
-        """处理日志轮转"""
-        if current_size < self._last_size:
-            self._last_position = 0
+        read_done = time.perf_counter()
+        _read_seconds.observe(read_done - started)
+        self.missing = False
+        self.has_more = self._tailer.has_more
+
+        if self._tailer.rotated:
             self._notified_events.clear()
-            return True
-        return False
-    
-    def _process_line(self, line):
-        """处理单行日志"""
-        line = line.strip()
-        if not line:
-            return
-        
-        # 检测观看开始
-        match = self._re_create.search(line)
-        if match:
-            cid = match.group(1)
-            channel_id = match.group(2)
-            event_key = f"{cid}_{channel_id}"
-            
-            if event_key not in self._notified_events:
-                self._notified_events.add(event_key)
-                time_str = datetime.now().strftime("%H:%M:%S")
-                short_cid = cid[-4:] if len(cid) > 4 else cid
-                
+            _switches.inc()
+        if not chunk:
+            return []
+        self.idle = False
+
+        _read_bytes.inc(len(chunk))
+        _read_lines.inc(chunk.count(b'\n'))
+        matched = self._matcher.scan(chunk)
+        _match_seconds.observe(time.perf_counter() - read_done)
 
+        changed = []
+        notified_events = self._notified_events
+        for event in matched:
+            event_key = f"{event.cid}_{event.channel_id}"
+            if event.kind == CHANNEL_START:
+                # 重复的开始行只刷新有效期
+                if not notified_events.add(event_key):
+                    _duplicates.inc(label=event.kind)
+                    continue
+            elif not notified_events.discard(event_key):
+                _duplicates.inc(label=event.kind)
+                continue
+            _events.inc(label=event.kind)
+            changed.append(event._replace(source=self.name))
+        return changed
+
+    def check_newer_log(self):
+        """
+        检查是否出现了编号更大的日志（调用时旧日志已读到末尾）
+
+        Returns:
+            bool: 是否已切换
+        """
+        index = self._index
+        if index is None:
+            return False
+        old_next = index.next_path()
+        if not index.refresh():
+            return False
+        self._watcher.remove(old_next)
+        self._follow(index.latest_path)
+        return True
+
+    def save_checkpoint(self, force=False):
+        """到达检查点间隔且读取位置有变化时写入检查点"""
+        if self._tailer is None:
+            return
+        now = time.monotonic()
+        position = self._tailer.position
+        if not force and (position == self._saved_position
+                          or now - self._last_save < self._checkpoint_interval):
             return
+        self._checkpoint.save(self.log_path, position, self._notified_events)
+        self._saved_position = position
+        self._last_save = now
+
+    def checkpoint_remaining(self):
+        """距离下次应写入检查点的秒数，读取位置没有变化时返回 None"""
+        if self._tailer is None or self._tailer.position == self._saved_position:
+            return None
+        return max(0.0, self._last_save + self._checkpoint_interval - time.monotonic())
+
     def _check_cycle(self):
         """单次检查周期"""
-        if not os.path.exists(self.log_path):
-            time.sleep(self._file_wait)
+        try:
+            events = self.poll()
+        except PermissionError as e:
+            _errors.inc(label=type(e).__name__)
+            time.sleep(0.5)
             return
-        
-        current_size = os.path.getsize(self.log_path)
-        self._handle_rotation(current_size)
-        self._last_size = current_size
-        
-        if current_size > self._last_position:
-            for line in self._read_new_lines():
-                self._process_line(line)
-        
-        time.sleep(self._check_interval)
-    
\ No newline at end of file
+
+        if events:
+            if self.sinks is None:
+                self.sinks = create_sinks()
+            dispatch(self.sinks, events)
+
+        if self.missing:
+            self._watcher.wait(self._file_wait)
+        elif not self.has_more and not self.check_newer_log():
+            self.save_checkpoint()
+            self._watcher.wait(self._watch_timeout)
+
+
+def apply_config(monitors, snapshot):
+    """
+    把新的配置快照应用到一组监控器（按名称取对应监控源的 patterns）
+
+    Args:
+        monitors: {name: LogMonitor}
+        snapshot: ConfigSnapshot
+    """
+    sources = {source['name']: source for source in load_sources(snapshot)}
+    for name, monitor in monitors.items():
+        source = sources.get(name)
+        if source:
+            monitor.apply_config(snapshot, source['patterns'], source['regexes'])
+        else:
+            monitor.apply_config(snapshot)
+
+
+def main():
+    """
+    无界面运行：python log_monitor.py [进程名] [日志目录]
+
+    不导入 PyQt5，通知按 notification.headless_sinks 输出（默认标准输出 JSON Lines）
+    """
+    import threading
+    from monitor_engine import MonitorEngine
+    from supervisor import SupervisorGroup
+
+    sources = load_sources()
+    if len(sys.argv) >= 2:
+        source = dict(sources[0], process=sys.argv[1])
+        if len(sys.argv) >= 3:
+            source['log_dir'] = sys.argv[2]
+        sources = [source]
+
+    sinks = create_sinks(config.get('notification.headless_sinks', [{'type': 'stdout'}]),
+                         show_source=len(sources) > 1)
+    config.watch()
+    start_metrics()
+
+    def on_events(events):
+        dispatch(sinks, events)
+
+    if config.get('monitor.engine', 'thread') == 'asyncio':
+        import asyncio
+        from async_monitor import AsyncMonitor
+
+        monitor = AsyncMonitor(sources, on_events=on_events)
+        for sink in sinks:
+            sink.started()
+        try:
+            asyncio.run(monitor.run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for sink in sinks:
+                sink.close()
+        return
+
+    engine = MonitorEngine(sources, on_events=on_events)
+    supervisors = SupervisorGroup(
+        sources,
+        on_start=lambda name, pid, log_path: engine.resume(name, log_path),
+        on_exit=engine.pause)
+    threading.Thread(target=supervisors.run, name="supervisor", daemon=True).start()
+    worker = threading.Thread(target=engine.run, name="monitor")
+    worker.start()
+    for sink in sinks:
+        sink.started()
+
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        supervisors.stop()
+        engine.stop()
+        worker.join(2)
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
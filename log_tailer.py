@@ -0,0 +1,155 @@
+import os
+
+
+class LogTailer:
+    """
+    增量读取日志文件 - 二进制模式
+
+    每次读取采用"打开-读取-关闭"模式，不持有文件句柄；
+    只返回以换行结尾的完整行，未写完的半行保留到下次读取。
+    """
+
+    def __init__(self, path, position=0, buffer_size=64 * 1024, max_read=4 * 1024 * 1024):
+        """
+        Args:
+            path: 日志文件路径
+            position: 起始字节偏移（必须位于行首）
+            buffer_size: 单次 readinto 的缓冲区大小
+            max_read: 单次 read() 最多读取的字节数，避免突发写入时占用过多内存
+        """
+        self.path = path
+        self.rotated = False
+        self._truncated = False
+        self._read_position = position
+        self._buffer = bytearray(buffer_size)
+        self._pending = bytearray()
+        self._max_read = max_read
+
+    @property
+    def position(self):
+        """已完整消费的字节偏移（下一行的起点）"""
+        return self._read_position - len(self._pending)
+
+    @property
+    def has_more(self):
+        """上次读取是否因 max_read 截断（文件中仍有未读内容）"""
+        return self._truncated
+
+    def seek(self, position):
+        """跳转到指定偏移（必须位于行首），丢弃未完成的半行"""
+        self._read_position = position
+        self._pending.clear()
+
+    def seek_end(self, block_size=64 * 1024):
+        """
+        跳转到文件末尾最后一个完整行之后（末尾的半行留待下次读取）
+
+        Returns:
+            int: 新的偏移
+        """
+        size = os.stat(self.path).st_size
+        position = 0
+        with open(self.path, 'rb') as f:
+            end = size
+            while end > 0:
+                start = max(0, end - block_size)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                end = start
+        self.seek(position)
+        return position
+
+    def read(self):
+        """
+        读取新增的完整行
+
+        Returns:
+            bytes: 以换行结尾的完整行数据，无新内容时为 b''
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            PermissionError: 文件被占用
+        """
+        size = os.stat(self.path).st_size
+
+        # 文件变小视为轮转，从头读取
+        self.rotated = size < self._read_position
+        if self.rotated:
+            self.seek(0)
+
+        self._truncated = False
+        if size <= self._read_position:
+            return b''
+
+        remaining = min(size - self._read_position, self._max_read)
+        self._truncated = size - self._read_position > self._max_read
+        view = memoryview(self._buffer)
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._read_position)
+            while remaining > 0:
+                n = f.readinto(view[:min(remaining, len(view))])
+                if not n:
+                    break
+                self._pending += view[:n]
+                self._read_position += n
+                remaining -= n
+
+        end = self._pending.rfind(b'\n')
+        if end < 0:
+            return b''
+
+        chunk = bytes(self._pending[:end + 1])
+        del self._pending[:end + 1]
+        return chunk
+
+
+def read_blocks_reverse(path, end, block_size=1024 * 1024, max_bytes=None):
+    """
+    从 end 偏移向前按块读取日志，最新的块最先返回
+
+    每块只包含完整行：块开头被截断的半行会拼接到前一块的末尾。
+
+    Args:
+        path: 日志文件路径
+        end: 起始偏移（通常为 LogTailer.seek_end() 的返回值）
+        block_size: 每次读取的字节数
+        max_bytes: 最多向前读取的字节数，None 表示读到文件开头
+    """
+    position = end
+    carry = b''
+    consumed = 0
+    with open(path, 'rb') as f:
+        while position > 0 and (max_bytes is None or consumed < max_bytes):
+            start = max(0, position - block_size)
+            f.seek(start)
+            data = f.read(position - start) + carry
+            consumed += position - start
+            position = start
+
+            if start == 0:
+                yield data
+                return
+            newline = data.find(b'\n')
+            if newline < 0:
+                carry = data
+                continue
+            carry = data[:newline + 1]
+            yield data[newline + 1:]
+
+
+def iter_lines(chunk, encoding='utf-8'):
+    """
+    逐行解码数据块（惰性），跳过空行
+
+    Args:
+        chunk: LogTailer.read() 返回的数据
+        encoding: 文本编码
+    """
+    for raw in chunk.split(b'\n'):
+        raw = raw.strip()
+        if raw:
+            yield raw.decode(encoding, errors='ignore')
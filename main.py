@@ -1,16 +1,25 @@
+import time
+
+_T0 = time.perf_counter()
+
 import sys
 import os
+import queue
+import select
+import signal
+import socket
+import threading
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from PyQt5.QtCore import QTimer, QThread, pyqtSignal
-from PyQt5.QtWidgets import QApplication
-
-from config_loader import Config, config
+from config_loader import Config, config, load_sources
 from process_manager import ProcessManager
 from log_finder import LogFinder
-from toast_notifier import ToastNotifier, ToastManager
+from supervisor import SupervisorGroup
+from monitor_engine import MonitorEngine
+from notification_sinks import QtToastSink, build_notifications, create_sinks, dispatch
+from metrics import start_metrics
 
 
 # 全局变量
@@ -21,22 +30,39 @@ _app = None
 def parse_cli_args():
     """解析命令行参数"""
     args = {
-        'process_name': config.get('process.name'),
-        'log_dir': config.get('log.directory'),
-        'config_path': None
+        'process_name': None,
+        'log_dir': None,
+        'config_path': None,
+        'profile_startup': '--profile-startup' in sys.argv
     }
     
-    if len(sys.argv) >= 2:
-        args['process_name'] = sys.argv[1]
-    if len(sys.argv) >= 3:
-        args['log_dir'] = sys.argv[2]
-    if len(sys.argv) >= 4:
-        args['config_path'] = sys.argv[3]
+    argv = [arg for arg in sys.argv[1:] if arg != '--profile-startup']
+    if len(argv) >= 1:
+        args['process_name'] = argv[0]
+    if len(argv) >= 2:
+        args['log_dir'] = argv[1]
+    if len(argv) >= 3:
+        args['config_path'] = argv[2]
         Config(args['config_path'])
     
     return args
 
 
+def resolve_sources(args):
+    """
+    根据配置和命令行参数确定监控源
+    
+    命令行指定了进程名时只监控这一个源（沿用第一个监控源的其余配置）
+    """
+    sources = load_sources()
+    if args['process_name']:
+        source = dict(sources[0], process=args['process_name'])
+        if args['log_dir']:
+            source['log_dir'] = args['log_dir']
+        sources = [source]
+    return sources
+
+
 def interactive_input():
     """交互式获取日志路径"""
     path = input("请手动输入路径: ").strip().strip('"')
@@ -45,145 +71,264 @@ def interactive_input():
     return path
 
 
-class MonitorWorker(QThread):
+class StartupProfiler:
     """
-    监控工作线程 - 使用 QThread 确保与 Qt 兼容
+    启动耗时统计（--profile-startup）
+    
+    从 main.py 开始执行计时，每个阶段输出本阶段耗时和累计耗时到标准错误
     """
-    log_line_signal = pyqtSignal(str)  # 发送日志行到主线程处理
     
-    def __init__(self, log_path):
-        super().__init__()
-        self.log_path = log_path
-        self._running = True
-        self._paused = False
-        
-    def run(self):
-        """监控循环"""
-        import re
-        import time
-        from datetime import datetime
-        
-        # 编译正则
-        patterns = config.get('patterns', {})
-        re_create = re.compile(patterns.get('channel_create', 
-            r'Create Channel PeerCid is (\d+), ServiceID is \d+, ChanId\[(\d+)\]'))
-        re_end = re.compile(patterns.get('channel_end',
-            r'PeerCid is (\d+).*?ChanId\[(\d+)\]'))
-        end_keywords = patterns.get('end_keywords', ['TEARDOWN_REQ', 'Channel Closed'])
-        
-        check_interval = config.get('monitor.check_interval', 0.2)
-        file_wait = config.get('monitor.file_wait_interval', 3)
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._last = _T0
+    
+    def mark(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        print(f"[startup] {stage}: {(now - self._last) * 1000:.1f} ms"
+              f" (累计 {(now - _T0) * 1000:.1f} ms)", file=sys.stderr, flush=True)
+        self._last = now
+
+
+class NotificationDispatcher:
+    """
+    通知分发 - 主线程在第一条弹窗通知出现时才导入 PyQt5 并创建 QApplication
+    
+    在此之前主线程阻塞等待监控线程投递的通知（没有通知时不唤醒），
+    控制台、文件等输出直接交付；Qt 初始化完成后主线程进入 Qt 事件循环，
+    之后的通知由监控线程直接交付（弹窗通过线程安全的信号显示）。
+    
+    启动提示弹窗只在 startup_toast 为真（启动时目标进程已在运行）时显示，
+    也会使 Qt 在启动时加载；否则启动提示只交给其他输出，Qt 推迟到第一条通道通知。
+    """
+    
+    def __init__(self, sources, profiler=None, startup_toast=True):
+        self.sinks = create_sinks(show_source=len(sources) > 1)
+        self.startup_toast = startup_toast
+        self._toast = any(isinstance(sink, QtToastSink) for sink in self.sinks)
+        self._profiler = profiler or StartupProfiler()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._qt_running = False
+        # 投递通知和 Ctrl+C（signal.set_wakeup_fd）都向该套接字写入一个字节唤醒主线程；
+        # Windows 下阻塞在锁上的 Queue.get() 无法被 Ctrl+C 打断，select 可以
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+    
+    def post(self, kind, events=None):
+        """投递通知（任意线程）：kind 为 'startup' 或 'events'"""
+        with self._lock:
+            if not self._qt_running:
+                self._queue.put((kind, events))
+                self._wakeup()
+                return
+        self._deliver(kind, events)
+    
+    def _wakeup(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            # 缓冲区已满：主线程必然会被唤醒
+            pass
+    
+    def _deliver(self, kind, events):
+        if kind == 'startup':
+            for sink in self.sinks:
+                if isinstance(sink, QtToastSink) and not self.startup_toast:
+                    continue
+                sink.started()
+        else:
+            dispatch(self.sinks, events)
+    
+    def _needs_qt(self, kind, events):
+        if not self._toast:
+            return False
+        if kind == 'startup':
+            return self.startup_toast
+        return bool(build_notifications(events))
+    
+    def _wait(self):
+        """阻塞直到有通知投递或收到信号（信号处理函数随后在主线程执行，如 KeyboardInterrupt）"""
+        select.select([self._wake_r], [], [])
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
+    
+    def _start_qt(self):
+        """导入 PyQt5 并在主线程创建 QApplication"""
+        global _app
         
-        notified_events = set()
-        last_position = 0
-        last_size = 0
+        import toast_notifier  # noqa: F401  导入 PyQt5
+        self._profiler.mark("导入 PyQt5")
         
-        # 发送启动信号
-        self.log_line_signal.emit("__STARTUP__")
+        from PyQt5.QtWidgets import QApplication
+        _app = QApplication.instance() or QApplication(sys.argv)
+        self._profiler.mark("创建 QApplication")
+    
+    def run(self):
+        """
+        在主线程运行，阻塞直到 Ctrl+C
         
-        while self._running:
-            try:
-                if not os.path.exists(self.log_path):
-                    time.sleep(file_wait)
-                    continue
-                
-                current_size = os.path.getsize(self.log_path)
-                
-                if current_size < last_size:
-                    last_position = 0
-                    notified_events.clear()
-                
-                last_size = current_size
-                
-                if current_size > last_position:
+        Returns:
+            int: 退出码
+        """
+        previous = signal.set_wakeup_fd(self._wake_w.fileno())
+        try:
+            while True:
+                self._wait()
+                while True:
                     try:
-                        with open(self.log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            f.seek(last_position)
-                            new_lines = f.readlines()
-                            last_position = f.tell()
-                        
-                        for line in new_lines:
-                            line_stripped = line.strip()
-                            if not line_stripped:
-                                continue
-                            
-                            # 发送到主线程处理（避免线程安全问题）
-                            self.log_line_signal.emit(line_stripped)
-                            
-                    except PermissionError:
-                        time.sleep(0.5)
+                        kind, events = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    
+                    if not self._needs_qt(kind, events):
+                        self._deliver(kind, events)
                         continue
-                
-                time.sleep(check_interval)
-                
-            except Exception as e:
-                time.sleep(3)
+                    
+                    self._start_qt()
+                    self._deliver(kind, events)
+                    self._profiler.mark("首条通知")
+                    
+                    with self._lock:
+                        # 切换前投递的通知按顺序交付，之后由监控线程直接交付
+                        while not self._queue.empty():
+                            self._deliver(*self._queue.get_nowait())
+                        self._qt_running = True
+                    signal.set_wakeup_fd(previous)
+                    return _app.exec_()
+        finally:
+            signal.set_wakeup_fd(previous)
     
-    def stop(self):
-        self._running = False
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        self._wake_r.close()
+        self._wake_w.close()
 
 
 class MainController:
     """
-    主控制器 - 在主线程运行，处理所有 GUI 操作
+    主控制器 - 监控引擎和进程监督各自运行在后台线程，主线程负责通知
     """
     
-    def __init__(self, log_path):
-        self.log_path = log_path
-        self.notifier = ToastNotifier()
-        self.worker = MonitorWorker(log_path)
-        self.worker.log_line_signal.connect(self._on_log_line)
-        
-        # 状态
-        self.notified_events = set()
-        import re
-        patterns = config.get('patterns', {})
-        self.re_create = re.compile(patterns.get('channel_create', 
-            r'Create Channel PeerCid is (\d+), ServiceID is \d+, ChanId\[(\d+)\]'))
-        self.re_end = re.compile(patterns.get('channel_end',
-            r'PeerCid is (\d+).*?ChanId\[(\d+)\]'))
-        self.end_keywords = patterns.get('end_keywords', ['TEARDOWN_REQ', 'Channel Closed'])
-        
-    def _on_log_line(self, line):
-        """在主线程处理日志行"""
-        if line == "__STARTUP__":
-            self.notifier.show("启动", "", "")
-            return
-            
-        from datetime import datetime
+    def __init__(self, sources, profiler=None, startup_toast=True):
+        self.sources = sources
+        self.dispatcher = NotificationDispatcher(sources, profiler, startup_toast)
+        self.engine = MonitorEngine(
+            sources, on_events=lambda events: self.dispatcher.post('events', events))
+        self._worker = threading.Thread(target=self._run_engine, name="monitor")
         
-        # 检测观看开始
-        match = self.re_create.search(line)
-        if match:
-            cid = match.group(1)
-            channel_id = match.group(2)
-            event_key = f"{cid}_{channel_id}"
-            
-            if event_key not in self.notified_events:
-                self.notified_events.add(event_key)
-                time_str = datetime.now().strftime("%H:%M:%S")
-                short_cid = cid[-4:] if len(cid) > 4 else cid
-                self.notifier.show("系统更新提醒", 
-                    f"设备版本 {short_cid} 将更新", cid)
-            return
-        
-        # 检测观看结束
-        has_end = any(kw in line for kw in self.end_keywords)
-        if has_end:
-            match_end = self.re_end.search(line)
-            if match_end:
-                ended_key = f"{match_end.group(1)}_{match_end.group(2)}"
-                if ended_key in self.notified_events:
-                    self.notified_events.remove(ended_key)
+        # 进程退出时暂停对应监控源，重新启动后切换到最新日志
+        engine = self.engine
+        self.supervisors = SupervisorGroup(
+            sources,
+            on_start=lambda name, pid, log_path: engine.resume(name, log_path),
+            on_exit=engine.pause)
+        self._supervisor_thread = threading.Thread(
+            target=self.supervisors.run, name="supervisor", daemon=True)
+    
+    def attach(self, name, pid, log_path):
+        """启动前已找到进程和日志的监控源直接开始监控"""
+        self.supervisors.supervisors[name].attach(pid, log_path)
+        self.engine.resume(name, log_path)
+    
+    def _run_engine(self):
+        """监控线程"""
+        self.dispatcher.post('startup')
+        self.engine.run()
     
     def start(self):
         """启动"""
-        self.worker.start()
-        
+        self._worker.start()
+        self._supervisor_thread.start()
+    
+    def run(self):
+        """在主线程处理通知直到退出，返回退出码"""
+        try:
+            return self.dispatcher.run()
+        except KeyboardInterrupt:
+            return 0
+        finally:
+            self.stop()
+    
     def stop(self):
         """停止"""
-        self.worker.stop()
-        self.worker.wait(2000)
+        self.supervisors.stop()
+        self.engine.stop()
+        self._worker.join(2)
+        self.dispatcher.close()
+
+
+def run_async(sources, profiler):
+    """
+    asyncio 模式：进程等待、日志查找和读取都由 AsyncMonitor 的协程完成
+    
+    安装了 qasync 时协程直接运行在 Qt 事件循环上（单线程，启动时即加载 Qt）；
+    否则事件循环运行在一个后台线程，主线程按需加载 Qt
+    """
+    global _app
+    import asyncio
+    from async_monitor import AsyncMonitor
+    
+    try:
+        import qasync
+    except ImportError:
+        qasync = None
+    
+    if qasync is not None:
+        from PyQt5.QtWidgets import QApplication
+        _app = QApplication.instance() or QApplication(sys.argv)
+        profiler.mark("创建 QApplication")
+        
+        sinks = create_sinks(show_source=len(sources) > 1)
+        for sink in sinks:
+            sink.started()  # 在主线程完成初始化
+        
+        monitor = AsyncMonitor(sources, on_events=lambda events: dispatch(sinks, events))
+        loop = qasync.QEventLoop(_app)
+        asyncio.set_event_loop(loop)
+        # Ctrl+C 取消监控协程，协程结束后事件循环停止
+        signal.signal(signal.SIGINT, lambda *args: monitor.stop())
+        with loop:
+            task = loop.create_task(monitor.run())
+            task.add_done_callback(lambda _: loop.stop())
+            try:
+                loop.run_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                # 运行到 AsyncMonitor.run 的 finally 完成：交付最后一批、写入检查点、关闭文件监视
+                if not task.done():
+                    task.cancel()
+                    try:
+                        loop.run_until_complete(task)
+                    except asyncio.CancelledError:
+                        pass
+                for sink in sinks:
+                    sink.close()
+        return
+    
+    # 进程等待在协程中进行，启动时还没有目标进程：不显示启动弹窗，Qt 推迟到第一条通知
+    dispatcher = NotificationDispatcher(sources, profiler, startup_toast=False)
+    monitor = AsyncMonitor(sources, on_events=lambda events: dispatcher.post('events', events))
+    thread = threading.Thread(
+        target=asyncio.run, args=(monitor.run(),), name="async-monitor", daemon=True)
+    thread.start()
+    dispatcher.post('startup')
+    try:
+        sys.exit(dispatcher.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # 先停止监控（交付最后一批），再关闭各通知输出
+        monitor.stop()
+        thread.join(2)
+        dispatcher.close()
 
 
 def main():
@@ -191,29 +336,42 @@ def main():
     global _app, _notifier
     
     args = parse_cli_args()
+    profiler = StartupProfiler(args['profile_startup'])
+    profiler.mark("导入模块")
     
-    # 等待进程
-    ProcessManager.wait_for_start(args['process_name'])
-    
-    # 查找日志
-    finder = LogFinder()
-    log_path = finder.find_with_fallback(args['log_dir'])
+    sources = resolve_sources(args)
+    config.watch()
+    start_metrics()
+    profiler.mark("读取配置")
     
-    if not log_path:
-        log_path = interactive_input()
+    if config.get('monitor.engine', 'thread') == 'asyncio':
+        run_async(sources, profiler)
+        return
     
-    # 创建 Qt 应用（必须在主线程）
-    _app = QApplication.instance() or QApplication(sys.argv)
+    # 只有一个监控源时沿用原流程：阻塞等待进程，找不到日志时手动输入
+    attached = None
+    if len(sources) == 1:
+        source = sources[0]
+        pid = ProcessManager.wait_for_start(source['process'])
+        profiler.mark("等待进程启动")
+        
+        finder = LogFinder(source['pattern'], source['backup_paths'])
+        log_path = finder.find_with_fallback(source['log_dir'])
+        
+        if not log_path:
+            log_path = interactive_input()
+        attached = (source['name'], pid, log_path)
+        profiler.mark("查找日志")
     
-    # 创建控制器（初始化 ToastNotifier）
-    controller = MainController(log_path)
+    # 创建控制器（按 notification.sinks 创建通知输出；Qt 在第一条弹窗时才加载，
+    # 多监控源时启动时还没有目标进程，不显示启动弹窗）
+    controller = MainController(sources, profiler, startup_toast=attached is not None)
+    if attached:
+        controller.attach(*attached)
     controller.start()
+    profiler.mark("启动监控")
     
-    # 启动 Qt 事件循环
-    try:
-        sys.exit(_app.exec_())
-    except KeyboardInterrupt:
-        controller.stop()
+    sys.exit(controller.run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+from config_loader import config
+
+
+# 耗时直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+# 数量直方图的默认分桶
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+PREFIX = 'video_stalker_'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """
+    单调递增计数器，可按一个标签分组（如错误类型）
+
+    线程安全：errors_total 等计数器由多个线程（监控、调度、写入线程）共同更新
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {} if label else {None: 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, label=None):
+        with self._lock:
+            values = self._values
+            values[label] = values.get(label, 0) + amount
+
+    def value(self, label=None):
+        return self._values.get(label, 0)
+
+    def samples(self):
+        """[(名称后缀, 标签, 值)]"""
+        with self._lock:
+            items = list(self._values.items())
+        return [('', {} if key is None else {self.label: key}, value) for key, value in items]
+
+    def to_dict(self):
+        with self._lock:
+            if not self.label:
+                return self._values[None]
+            return dict(self._values)
+
+
+class Gauge:
+    """当前值，可以直接 set()，也可以由 func 在读取时计算"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, func=None):
+        self.name = name
+        self.help = help
+        self.func = func
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return 0
+        return self._value
+
+    def samples(self):
+        return [('', {}, self.value())]
+
+    def to_dict(self):
+        return self.value()
+
+
+class Histogram:
+    """固定分桶直方图：observe() 只做一次二分查找和三次加法（加锁，可在多个线程中更新）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def _snapshot(self):
+        """(各桶计数, count, sum) 的一致快照"""
+        with self._lock:
+            return list(self._counts), self.count, self.sum
+
+    def quantile(self, q, counts=None):
+        """按分桶上限估算分位数，无数据时返回 None"""
+        if counts is None:
+            counts = self._snapshot()[0]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def samples(self):
+        counts, count, total = self._snapshot()
+        result = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            result.append(('_bucket', {'le': repr(float(bound))}, cumulative))
+        result.append(('_bucket', {'le': '+Inf'}, count))
+        result.append(('_sum', {}, total))
+        result.append(('_count', {}, count))
+        return result
+
+    def to_dict(self):
+        counts, count, total = self._snapshot()
+        return {
+            'count': count,
+            'sum': total,
+            'p50': self.quantile(0.50, counts),
+            'p95': self.quantile(0.95, counts),
+            'p99': self.quantile(0.99, counts),
+        }
+
+
+class Metrics:
+    """
+    指标注册表
+
+    同名指标只创建一次，各模块在导入时取得自己的指标对象；
+    render() 输出 Prometheus 文本格式，to_dict() 用于 JSON 转储
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help, label=None):
+        return self._register(Counter, name, help, label)
+
+    def gauge(self, name, help, func=None):
+        return self._register(Gauge, name, help, func)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, help, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def _items(self):
+        """按名称排序的 (名称, 指标)，在锁内复制，避免与导入时的注册并发修改"""
+        with self._lock:
+            return sorted(self._metrics.items())
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        for name, metric in self._items():
+            full_name = PREFIX + name
+            lines.append(f"# HELP {full_name} {metric.help}")
+            lines.append(f"# TYPE {full_name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{full_name}{suffix}{{{text}}} {value}" if text
+                             else f"{full_name}{suffix} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        return {name: metric.to_dict() for name, metric in self._items()}
+
+    def dump(self, path):
+        """原子写入 JSON（临时文件 + 替换）"""
+        data = {'time': time.time(), 'metrics': self.to_dict()}
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError:
+            return False
+        return True
+
+
+# 全局指标注册表
+metrics = Metrics()
+
+metrics.gauge('start_time_seconds', "进程启动时间（epoch 秒）").set(time.time())
+
+
+def _serve(host, port):
+    """
+    在后台线程中提供 /metrics 和 /metrics.json（此时才导入 http.server）
+
+    Returns:
+        ThreadingHTTPServer
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path in ('/', '/metrics'):
+                body = metrics.render().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/metrics.json':
+                body = json.dumps(metrics.to_dict(), ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_exporters = []
+
+
+def start_metrics():
+    """
+    按配置启动指标输出（重复调用无效）：
+
+    - metrics.port 非 0 时在 metrics.host（默认 127.0.0.1）上提供 /metrics 和 /metrics.json
+    - metrics.dump_path 非空时每 metrics.dump_interval 秒写入一次 JSON
+
+    Returns:
+        ThreadingHTTPServer 或 None
+    """
+    if _exporters:
+        return _exporters[0]
+
+    server = None
+    port = config.get('metrics.port', 0)
+    if port:
+        try:
+            server = _serve(config.get('metrics.host', '127.0.0.1'), port)
+        except OSError as e:
+            print(f"指标端口 {port} 无法监听: {e}", file=sys.stderr)
+
+    dump_path = config.get('metrics.dump_path', '')
+    if dump_path:
+        from scheduler import scheduler
+
+        def dump():
+            metrics.dump(dump_path)
+
+        scheduler.call_every(config.get('metrics.dump_interval', 60) or 60, dump, name="metrics-dump")
+
+    _exporters.append(server)
+    return server
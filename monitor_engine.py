@@ -0,0 +1,174 @@
+import threading
+from collections import deque
+
+from config_loader import config, load_sources
+from log_monitor import LogMonitor, apply_config
+from event_batcher import EventBatcher
+from file_watcher import create_watcher
+from metrics import metrics
+from scheduler import Backoff
+
+
+_errors = metrics.counter('errors_total', "按类型统计的异常次数", label='type')
+
+
+class MonitorEngine:
+    """
+    监控引擎 - 在一个线程内复用多个监控源
+
+    所有日志共享一个文件变更监视器，事件合并为批次后通过 on_events 回调交付。
+    pause() / resume() 可从任意线程调用，命令在引擎线程中执行。
+    """
+
+    def __init__(self, sources=None, on_events=None, checkpoint_path=None):
+        """
+        Args:
+            sources: 监控源配置列表，默认 load_sources()
+            on_events: 回调 (list[ChannelEvent])，在引擎线程中执行
+            checkpoint_path: 检查点文件路径，默认读取 monitor.checkpoint_path
+        """
+        self._watcher = create_watcher()
+        self._monitors = {}
+        for source in sources or load_sources():
+            self._monitors[source['name']] = LogMonitor(None, source=source, watcher=self._watcher,
+                                                        checkpoint_path=checkpoint_path)
+        self._on_events = on_events
+        self._batcher = EventBatcher()
+        self._commands = deque()
+        self._wake = threading.Event()
+        self._running = True
+        self._file_wait = config.get('monitor.file_wait_interval', 3)
+        # 日志空闲时兜底超时逐步放大到 idle_timeout_max，有新内容后回到 watch_timeout
+        self._idle = Backoff(config.get('monitor.watch_timeout', 2),
+                             config.get('monitor.idle_timeout_max', 30))
+        config.subscribe(self._on_config)
+
+    @property
+    def monitors(self):
+        return self._monitors
+
+    @property
+    def watcher(self):
+        """所有监控源共享的文件变更监视器"""
+        return self._watcher
+
+    def pause(self, name):
+        """暂停指定监控源（线程安全）"""
+        self._commands.append(('pause', name, None))
+        self._notify()
+
+    def resume(self, name, log_path):
+        """以指定日志恢复监控源（线程安全）"""
+        self._commands.append(('resume', name, log_path))
+        self._notify()
+
+    def _on_config(self, snapshot):
+        """配置文件已重新加载（在重新加载的线程中调用），交给引擎线程应用"""
+        self._commands.append(('config', None, snapshot))
+        self._notify()
+
+    def _apply_config(self, snapshot):
+        """热重载：更新匹配规则和时间参数，日志读取不中断"""
+        apply_config(self._monitors, snapshot)
+        self._batcher.window = snapshot.get('monitor.batch_window', 0)
+        self._file_wait = snapshot.get('monitor.file_wait_interval', 3)
+        self._idle.update(snapshot.get('monitor.watch_timeout', 2),
+                          snapshot.get('monitor.idle_timeout_max', 30))
+
+    def _notify(self):
+        self._wake.set()
+        self._watcher.wakeup()
+
+    def _apply_commands(self):
+        """
+        执行其他线程排队的命令 (action, name, payload)：
+        pause 无 payload，resume 的 payload 为日志路径，config 的 payload 为 ConfigSnapshot
+        """
+        while self._commands:
+            action, name, payload = self._commands.popleft()
+            if action == 'config':
+                try:
+                    self._apply_config(payload)
+                except Exception as e:
+                    # 新配置无法应用时继续按当前配置监控，其余命令照常执行
+                    _errors.inc(label=type(e).__name__)
+                continue
+            monitor = self._monitors.get(name)
+            if monitor is None:
+                continue
+            if action == 'pause':
+                monitor.pause()
+            else:
+                monitor.resume(payload)
+
+    def _deliver(self, force=False):
+        if len(self._batcher) and (force or self._batcher.due()):
+            batch = self._batcher.flush()
+            if self._on_events:
+                self._on_events(batch)
+
+    def run(self):
+        """阻塞运行监控循环，直到 stop()"""
+        while self._running:
+            self._apply_commands()
+            active = [m for m in self._monitors.values() if m.active]
+            if not active:
+                # 所有目标进程都未运行：阻塞等待 resume()，不做任何轮询
+                self._deliver(force=True)
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            busy = False
+            timeout = float('inf')
+            for monitor in active:
+                try:
+                    self._batcher.add(monitor.poll())
+                except PermissionError as e:
+                    _errors.inc(label=type(e).__name__)
+                    timeout = min(timeout, 0.5)
+                    continue
+                except Exception as e:
+                    _errors.inc(label=type(e).__name__)
+                    timeout = min(timeout, 3)
+                    continue
+                if monitor.has_more or monitor.check_newer_log():
+                    busy = True
+            if busy:
+                continue
+
+            # 只有状态变化的事件按批交付
+            self._deliver()
+
+            if all(monitor.missing for monitor in active):
+                # 日志文件都不存在（被删除或尚未创建）：已收集的事件不再等待批量窗口
+                self._deliver(force=True)
+                timeout = self._file_wait
+            elif any(not monitor.idle for monitor in active):
+                timeout = min(timeout, self._idle.reset())
+            else:
+                timeout = min(timeout, self._idle.next())
+
+            # 事件全部交付后才推进检查点；未到间隔的检查点与下次唤醒合并
+            remaining = self._batcher.remaining()
+            if remaining is None:
+                for monitor in active:
+                    monitor.save_checkpoint()
+                    checkpoint = monitor.checkpoint_remaining()
+                    if checkpoint is not None:
+                        timeout = min(timeout, checkpoint)
+            else:
+                timeout = min(timeout, remaining)
+
+            # 阻塞直到任一日志变化或到达上面合并出的最早时间（轮询模式下按 check_interval 检查）
+            self._watcher.wait(timeout)
+
+        config.unsubscribe(self._on_config)
+        self._deliver(force=True)
+        for monitor in self._monitors.values():
+            monitor.save_checkpoint(force=True)
+        self._watcher.close()
+
+    def stop(self):
+        self._running = False
+        self._notify()
@@ -0,0 +1,326 @@
+import sys
+import json
+import time
+import queue
+import socket
+import threading
+
+from config_loader import config
+from line_matcher import CHANNEL_START
+from metrics import metrics
+
+
+_notify_seconds = metrics.histogram('notify_seconds', "一批事件交给全部通知输出的耗时")
+_log_to_notify = metrics.histogram('log_to_notify_seconds', "日志行时间戳到交付通知的延迟（需要 patterns.timestamp）")
+_sink_errors = metrics.counter('sink_errors_total', "通知输出出错次数", label='sink')
+_sink_dropped = metrics.counter('sink_dropped_total', "队列已满被丢弃的事件批次", label='sink')
+
+
+def event_to_dict(event, timestamp=None):
+    """通道事件转换为可 JSON 序列化的字典"""
+    return {
+        'kind': event.kind,
+        'cid': event.cid,
+        'channel_id': event.channel_id,
+        'source': event.source,
+        'time': time.time() if timestamp is None else timestamp,
+        'log_time': event.time,
+    }
+
+
+def build_notifications(events, show_source=False):
+    """把通道开始事件转换为通知 [(title, message, channel_id), ...]"""
+    notifications = []
+    for event in events:
+        if event.kind == CHANNEL_START:
+            cid = event.cid
+            short_cid = cid[-4:] if len(cid) > 4 else cid
+            message = f"设备版本 {short_cid} 将更新"
+            if show_source:
+                message = f"[{event.source}] {message}"
+            notifications.append(("系统更新提醒", message, cid))
+    return notifications
+
+
+class NotificationSink:
+    """
+    通知输出接口 - notify() 在监控线程中调用，实现需尽快返回
+
+    各方法默认什么也不做，子类只需覆盖关心的方法；
+    依赖较重的输出（总线、SQLite、会话统计）在创建时才导入对应模块
+    """
+
+    def started(self):
+        """监控已启动"""
+
+    def notify(self, events):
+        """
+        交付一批通道事件
+
+        Args:
+            events: list[ChannelEvent]
+        """
+
+    def close(self):
+        """释放资源"""
+
+
+class QtToastSink(NotificationSink):
+    """Qt 右下角弹窗通知（首次使用时才导入 PyQt5）"""
+
+    def __init__(self, show_source=False, duration=None, cooldown=None):
+        self._show_source = show_source
+        self._duration = duration or config.get('notification.duration_ms', 5000)
+        self._cooldown = cooldown or config.get('monitor.notification_cooldown', 3)
+        self._notifier = None
+
+    @property
+    def notifier(self):
+        if self._notifier is None:
+            from toast_notifier import ToastNotifier
+            self._notifier = ToastNotifier()
+        return self._notifier
+
+    def started(self):
+        self.notifier.show("启动", "", "")
+
+    def notify(self, events):
+        notifications = build_notifications(events, self._show_source)
+        if notifications:
+            self.notifier.show_batch(notifications, self._duration, self._cooldown)
+
+
+class StreamSink(NotificationSink):
+    """JSON Lines 输出到文本流（默认标准输出）"""
+
+    def __init__(self, stream=None):
+        self._stream = stream or sys.stdout
+
+    def _write(self, record):
+        self._stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._stream.flush()
+
+    def started(self):
+        self._write({'kind': 'startup', 'time': time.time()})
+
+    def notify(self, events):
+        now = time.time()
+        for event in events:
+            self._write(event_to_dict(event, now))
+
+
+class FileSink(StreamSink):
+    """JSON Lines 追加写入文件"""
+
+    def __init__(self, path):
+        super().__init__(open(path, 'a', encoding='utf-8'))
+
+    def close(self):
+        self._stream.close()
+
+
+class DatagramSink(NotificationSink):
+    """
+    每个事件一个 JSON 数据报，发送到 UDP 或 Unix 域套接字
+
+    接收端不存在时静默丢弃，不影响监控
+    """
+
+    def __init__(self, address):
+        """
+        Args:
+            address: "udp://host:port" 或 "unix:///path/to/socket"
+        """
+        if address.startswith('unix://'):
+            self._address = address[len('unix://'):]
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        else:
+            host, _, port = address[len('udp://'):].rpartition(':')
+            self._address = (host or '127.0.0.1', int(port))
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def notify(self, events):
+        now = time.time()
+        for event in events:
+            try:
+                self._sock.sendto(json.dumps(event_to_dict(event, now)).encode('utf-8'), self._address)
+            except OSError:
+                pass
+
+    def close(self):
+        self._sock.close()
+
+
+class WebhookSink(NotificationSink):
+    """HTTP POST 到本地 webhook，由后台线程发送，队列满时丢弃"""
+
+    def __init__(self, url, timeout=2, max_pending=1000):
+        self._url = url
+        self._timeout = timeout
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, name="webhook-sink", daemon=True)
+        self._thread.start()
+
+    def notify(self, events):
+        now = time.time()
+        try:
+            self._queue.put_nowait([event_to_dict(event, now) for event in events])
+        except queue.Full:
+            _sink_dropped.inc(label=type(self).__name__)
+
+    def _run(self):
+        import urllib.request
+
+        while True:
+            payload = self._queue.get()
+            if payload is None:
+                return
+            request = urllib.request.Request(
+                self._url, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=self._timeout).close()
+            except Exception:
+                _sink_errors.inc(label=type(self).__name__)
+
+    def close(self):
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class BusSink(NotificationSink):
+    """通过本地事件总线（EventBus）把事件推送给所有订阅者"""
+
+    def __init__(self, address, replay=1000, max_pending=1000):
+        from event_bus import EventBus
+        self.bus = EventBus(address, replay, max_pending)
+
+    def started(self):
+        self.bus.publish([{'kind': 'startup', 'time': time.time()}])
+
+    def notify(self, events):
+        now = time.time()
+        self.bus.publish([event_to_dict(event, now) for event in events])
+
+    def close(self):
+        self.bus.close()
+
+
+class JournalSink(NotificationSink):
+    """把事件追加到 SQLite 事件日志（EventJournal），由独立的写入线程提交"""
+
+    def __init__(self, path, max_pending=10000):
+        from event_journal import EventJournal
+        self.journal = EventJournal(path, max_pending)
+
+    def notify(self, events):
+        self.journal.append(events)
+
+    def close(self):
+        self.journal.close()
+
+
+class SessionSink(NotificationSink):
+    """把事件交给 SessionTracker 统计观看会话，由调度器定期导出汇总（有新事件时才写入）"""
+
+    def __init__(self, path, interval=60, tracker=None):
+        """
+        Args:
+            path: 汇总 JSON 路径
+            interval: 导出间隔（秒）
+            tracker: 共享的 SessionTracker，默认新建
+        """
+        from scheduler import scheduler
+        if tracker is None:
+            from session_tracker import SessionTracker
+            tracker = SessionTracker()
+        self.tracker = tracker
+        self._path = path
+        self._dirty = False
+        self._task = scheduler.call_every(interval, self._export, name="session-export")
+
+    def notify(self, events):
+        self.tracker.feed(events)
+        self._dirty = True
+
+    def _export(self):
+        if self._dirty:
+            self._dirty = False
+            self.tracker.export(self._path)
+
+    def close(self):
+        self._task.cancel()
+        self.tracker.export(self._path)
+
+
+def create_sinks(specs=None, show_source=False):
+    """
+    按配置创建通知输出
+
+    Args:
+        specs: 列表，每项如 {"type": "toast"} / {"type": "stdout"} /
+               {"type": "file", "path": ...} / {"type": "udp", "address": "127.0.0.1:9000"} /
+               {"type": "unix", "path": ...} / {"type": "webhook", "url": ...} /
+               {"type": "bus", "address": "tcp://127.0.0.1:9465", "replay": 1000} /
+               {"type": "journal", "path": "events.db"} /
+               {"type": "sessions", "path": ..., "interval": 60, "window_hours": 24}；
+               默认读取 notification.sinks
+        show_source: 弹窗中是否显示监控源名称
+
+    Raises:
+        ValueError: 未知的类型，或当前平台不支持 Unix 域套接字时使用了 unix 输出 / unix:// 总线
+    """
+    if specs is None:
+        specs = config.get('notification.sinks', [{'type': 'toast'}])
+
+    sinks = []
+    for spec in specs:
+        kind = spec.get('type')
+        if kind == 'toast':
+            sinks.append(QtToastSink(show_source))
+        elif kind == 'stdout':
+            sinks.append(StreamSink())
+        elif kind == 'file':
+            sinks.append(FileSink(spec['path']))
+        elif kind == 'udp':
+            sinks.append(DatagramSink('udp://' + spec['address']))
+        elif kind == 'unix':
+            # Windows 的 AF_UNIX 只支持流式套接字
+            if not hasattr(socket, 'AF_UNIX') or sys.platform == 'win32':
+                raise ValueError("当前平台不支持 Unix 域数据报套接字，unix 输出不可用，请改用 udp")
+            sinks.append(DatagramSink('unix://' + spec['path']))
+        elif kind == 'webhook':
+            sinks.append(WebhookSink(spec['url'], spec.get('timeout', 2)))
+        elif kind == 'bus':
+            if spec['address'].startswith('unix://') and not hasattr(socket, 'AF_UNIX'):
+                raise ValueError("当前平台不支持 Unix 域套接字，事件总线请使用 tcp:// 地址")
+            sinks.append(BusSink(spec['address'], spec.get('replay', 1000),
+                                 spec.get('max_pending', 1000)))
+        elif kind == 'journal':
+            sinks.append(JournalSink(spec['path'], spec.get('max_pending', 10000)))
+        elif kind == 'sessions':
+            from session_tracker import SessionTracker
+            tracker = SessionTracker(spec.get('window_hours', 24), spec.get('max_sessions', 1000))
+            sinks.append(SessionSink(spec['path'], spec.get('interval', 60), tracker))
+        else:
+            raise ValueError(f"未知的通知类型: {kind}")
+    return sinks
+
+
+def dispatch(sinks, events):
+    """把事件交给所有输出，单个输出出错不影响其他输出"""
+    started = time.perf_counter()
+    for sink in sinks:
+        try:
+            sink.notify(events)
+        except Exception:
+            _sink_errors.inc(label=type(sink).__name__)
+    _notify_seconds.observe(time.perf_counter() - started)
+
+    now = time.time()
+    for event in events:
+        if event.time is not None:
+            _log_to_notify.observe(max(0.0, now - event.time))
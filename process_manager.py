@@ -1,37 +1,331 @@
+import os
+import sys
 import subprocess
 import time
 
 from config_loader import config
 
 
-class ProcessManager:
-    """管理目标进程的监控和等待"""
-    
-    @staticmethod
-    def is_running(process_name):
-        """检查进程是否正在运行"""
+class TasklistProbe:
+    """tasklist 子进程查询（兜底方案）"""
+
+    def find_pid(self, process_name):
+        """返回进程 PID，未运行时返回 None"""
         try:
             result = subprocess.run(
-                ["tasklist", "/FI", f"IMAGENAME eq {process_name}"],
+                ["tasklist", "/FI", f"IMAGENAME eq {process_name}", "/FO", "CSV", "/NH"],
+                capture_output=True,
+                text=True,
+                creationflags=0x08000000
+            )
+        except Exception:
+            return None
+
+        for line in result.stdout.splitlines():
+            fields = [field.strip('"') for field in line.split('","')]
+            if len(fields) >= 2 and fields[0].lower() == process_name.lower():
+                try:
+                    return int(fields[1])
+                except ValueError:
+                    return None
+        return None
+
+    def is_alive(self, pid):
+        try:
+            result = subprocess.run(
+                ["tasklist", "/FI", f"PID eq {pid}", "/FO", "CSV", "/NH"],
                 capture_output=True,
                 text=True,
                 creationflags=0x08000000
             )
-            return process_name.lower() in result.stdout.lower()
         except Exception:
             return False
-    
+        return f'"{pid}"' in result.stdout
+
+
+class PsutilProbe:
+    """psutil 进程内枚举"""
+
+    def __init__(self):
+        import psutil
+        self._psutil = psutil
+
+    def find_pid(self, process_name):
+        name = process_name.lower()
+        for proc in self._psutil.process_iter(['name']):
+            if (proc.info['name'] or '').lower() == name:
+                return proc.pid
+        return None
+
+    def is_alive(self, pid):
+        return self._psutil.pid_exists(pid)
+
+    def wait_exit(self, pid, timeout):
+        """阻塞至多 timeout 秒等待进程退出，返回是否已退出"""
+        try:
+            self._psutil.Process(pid).wait(timeout)
+        except self._psutil.TimeoutExpired:
+            return False
+        except self._psutil.NoSuchProcess:
+            pass
+        return True
+
+
+class ProcfsProbe:
+    """Linux /proc 扫描"""
+
+    def __init__(self):
+        if not os.path.isdir('/proc'):
+            raise OSError("/proc 不可用")
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return b''
+
+    def find_pid(self, process_name):
+        name = process_name.lower()
+        comm_name = name[:15]  # comm 最多保留 15 个字符
+        for entry in os.scandir('/proc'):
+            if not entry.name.isdigit():
+                continue
+            comm = self._read(f'/proc/{entry.name}/comm').strip().decode(errors='ignore').lower()
+            if comm != comm_name:
+                continue
+            if len(name) > 15:
+                argv0 = self._read(f'/proc/{entry.name}/cmdline').split(b'\0', 1)[0]
+                if os.path.basename(argv0.decode(errors='ignore')).lower() != name:
+                    continue
+            return int(entry.name)
+        return None
+
+    def is_alive(self, pid):
+        return os.path.exists(f'/proc/{pid}')
+
+
+class ToolhelpProbe:
+    """Windows Toolhelp 快照枚举"""
+
+    TH32CS_SNAPPROCESS = 0x00000002
+    SYNCHRONIZE = 0x00100000
+    WAIT_TIMEOUT = 0x00000102
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESSENTRY32W(ctypes.Structure):
+            _fields_ = [
+                ('dwSize', wintypes.DWORD),
+                ('cntUsage', wintypes.DWORD),
+                ('th32ProcessID', wintypes.DWORD),
+                ('th32DefaultHeapID', ctypes.c_size_t),
+                ('th32ModuleID', wintypes.DWORD),
+                ('cntThreads', wintypes.DWORD),
+                ('th32ParentProcessID', wintypes.DWORD),
+                ('pcPriClassBase', ctypes.c_long),
+                ('dwFlags', wintypes.DWORD),
+                ('szExeFile', wintypes.WCHAR * 260),
+            ]
+
+        self._ctypes = ctypes
+        self._entry_type = PROCESSENTRY32W
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+        self._kernel32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+        self._kernel32.Process32FirstW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+        self._kernel32.Process32NextW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+        self._kernel32.OpenProcess.restype = wintypes.HANDLE
+        self._kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        self._kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+        self._kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._invalid_handle = ctypes.c_void_p(-1).value
+
+    def find_pid(self, process_name):
+        snapshot = self._kernel32.CreateToolhelp32Snapshot(self.TH32CS_SNAPPROCESS, 0)
+        if snapshot is None or snapshot == self._invalid_handle:
+            return None
+        try:
+            entry = self._entry_type()
+            entry.dwSize = self._ctypes.sizeof(entry)
+            name = process_name.lower()
+            ok = self._kernel32.Process32FirstW(snapshot, self._ctypes.byref(entry))
+            while ok:
+                if entry.szExeFile.lower() == name:
+                    return entry.th32ProcessID
+                ok = self._kernel32.Process32NextW(snapshot, self._ctypes.byref(entry))
+            return None
+        finally:
+            self._kernel32.CloseHandle(snapshot)
+
+    def is_alive(self, pid):
+        handle = self._kernel32.OpenProcess(self.SYNCHRONIZE, False, pid)
+        if not handle:
+            return False
+        try:
+            return self._kernel32.WaitForSingleObject(handle, 0) == self.WAIT_TIMEOUT
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+    def wait_exit(self, pid, timeout):
+        """在进程句柄上阻塞至多 timeout 秒，返回是否已退出"""
+        handle = self._kernel32.OpenProcess(self.SYNCHRONIZE, False, pid)
+        if not handle:
+            return True
+        try:
+            return self._kernel32.WaitForSingleObject(handle, int(timeout * 1000)) != self.WAIT_TIMEOUT
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+
+class WmiStartWatcher:
+    """
+    WMI 进程创建事件订阅（需要安装 wmi 包，仅 Windows）
+
+    事件由 WMI 服务推送，等待期间本进程不做任何轮询
+    """
+
+    def __init__(self, process_name):
+        import pythoncom
+        import wmi
+
+        pythoncom.CoInitialize()
+        self._watcher = wmi.WMI().Win32_Process.watch_for("creation", Name=process_name)
+
+    def wait(self, timeout=None):
+        """
+        等待下一次进程启动
+
+        Returns:
+            int: 新进程 PID，超时返回 None
+        """
+        import wmi
+
+        try:
+            proc = self._watcher(timeout_ms=-1 if timeout is None else int(timeout * 1000))
+        except wmi.x_wmi_timed_out:
+            return None
+        return proc.ProcessId
+
+
+def create_probe(backend=None):
+    """
+    按配置创建进程探测器
+
+    Args:
+        backend: "auto" / "psutil" / "procfs" / "toolhelp" / "tasklist"，默认读取 process.probe
+    """
+    backend = backend or config.get('process.probe', 'auto')
+
+    if backend == 'auto':
+        candidates = ['psutil']
+        if sys.platform == 'win32':
+            candidates.append('toolhelp')
+        elif sys.platform.startswith('linux'):
+            candidates.append('procfs')
+    else:
+        candidates = [backend]
+
+    factories = {
+        'psutil': PsutilProbe,
+        'procfs': ProcfsProbe,
+        'toolhelp': ToolhelpProbe,
+    }
+    for name in candidates:
+        try:
+            if name in factories:
+                return factories[name]()
+        except (ImportError, OSError, AttributeError):
+            continue
+    return TasklistProbe()
+
+
+class ProcessManager:
+    """管理目标进程的监控和等待"""
+
+    _probe = None
+
+    @classmethod
+    def probe(cls):
+        """当前使用的进程探测器（首次调用时创建）"""
+        if cls._probe is None:
+            cls._probe = create_probe()
+        return cls._probe
+
+    @classmethod
+    def find_pid(cls, process_name):
+        """查找进程 PID，未运行时返回 None"""
+        return cls.probe().find_pid(process_name)
+
+    @classmethod
+    def is_running(cls, process_name):
+        """检查进程是否正在运行"""
+        return cls.find_pid(process_name) is not None
+
+    @classmethod
+    def is_alive(cls, pid):
+        """检查指定 PID 的进程是否仍存活"""
+        return cls.probe().is_alive(pid)
+
+    @classmethod
+    def wait_for_exit(cls, pid, timeout):
+        """
+        阻塞至多 timeout 秒等待进程退出
+
+        Returns:
+            bool: 进程是否已退出
+        """
+        probe = cls.probe()
+        if hasattr(probe, 'wait_exit'):
+            return probe.wait_exit(pid, timeout)
+
+        interval = config.get('process.wait_interval', 2)
+        deadline = time.monotonic() + timeout
+        while probe.is_alive(pid):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
+        return True
+
+    @staticmethod
+    def create_start_watcher(name):
+        """创建进程启动事件订阅，不可用时返回 None"""
+        if not config.get('process.start_events', True):
+            return None
+        try:
+            return WmiStartWatcher(name)
+        except Exception:
+            return None
+
     @classmethod
     def wait_for_start(cls, process_name=None):
         """
         阻塞等待进程启动
-        
+
         Args:
             process_name: 进程名，默认从配置读取
+
+        Returns:
+            int: 进程 PID
         """
         name = process_name or config.get('process.name')
         interval = config.get('process.wait_interval', 2)
         init_delay = config.get('process.init_delay', 1)
-        while not cls.is_running(name):
-            time.sleep(interval)
-        time.sleep(init_delay)
\ No newline at end of file
+
+        pid = cls.find_pid(name)
+        if pid is None:
+            watcher = cls.create_start_watcher(name)
+            while pid is None:
+                if watcher is not None:
+                    # 订阅可能漏掉订阅建立前瞬间启动的进程，超时后再查一次
+                    pid = watcher.wait(interval * 10)
+                else:
+                    time.sleep(interval)
+                if pid is None:
+                    pid = cls.find_pid(name)
+        time.sleep(init_delay)
+        return pid
\ No newline at end of file
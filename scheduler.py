@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import threading
+import time
+
+from metrics import metrics
+
+
+_runs = metrics.counter('scheduler_runs_total', "定时任务执行次数")
+_wakeups = metrics.counter('scheduler_wakeups_total', "调度线程唤醒次数（多个任务合并为一次）")
+_errors = metrics.counter('errors_total', "按类型统计的异常次数", label='type')
+
+
+class Backoff:
+    """
+    自适应间隔：有活动时回到最小间隔，空闲时按倍数逐步增大到最大间隔
+    """
+
+    def __init__(self, minimum, maximum=None, factor=2):
+        """
+        Args:
+            minimum: 最小（活动后的）间隔（秒）
+            maximum: 最大（长时间空闲时的）间隔，None 表示固定间隔
+            factor: 每次空闲后的放大倍数
+        """
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum or minimum)
+        self.factor = factor
+        self.current = minimum
+
+    def reset(self):
+        """检测到活动：回到最小间隔"""
+        self.current = self.minimum
+        return self.current
+
+    def next(self):
+        """返回本次间隔，并为下次空闲放大"""
+        interval = self.current
+        self.current = min(self.maximum, self.current * self.factor)
+        return interval
+
+    def update(self, minimum, maximum=None):
+        """修改范围（配置热重载）"""
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum or minimum)
+        self.current = min(max(self.current, self.minimum), self.maximum)
+
+
+class PeriodicTask:
+    """
+    Scheduler 中的周期任务（由 Scheduler.call_every 创建）
+
+    func() 返回真值表示本次有活动，下次按最小间隔执行；
+    否则间隔按 Backoff 逐步放大到 max_interval
+    """
+
+    def __init__(self, scheduler, func, interval, max_interval=None, name=None):
+        self.name = name or getattr(func, '__name__', 'task')
+        self.func = func
+        self.backoff = Backoff(interval, max_interval)
+        self.due = 0.0
+        self.cancelled = False
+        self._scheduler = scheduler
+        self._generation = 0
+
+    @property
+    def interval(self):
+        return self.backoff.current
+
+    def cancel(self):
+        self.cancelled = True
+
+    def poke(self):
+        """外部检测到活动：回到最小间隔并尽快执行一次"""
+        self.backoff.reset()
+        self._scheduler._reschedule(self, self._scheduler.clock())
+
+    def _run(self):
+        try:
+            active = self.func()
+        except Exception as e:
+            _errors.inc(label=type(e).__name__)
+            active = False
+        _runs.inc()
+        return self.backoff.reset() if active else self.backoff.next()
+
+
+class Scheduler:
+    """
+    定时任务调度 - 一个线程、一个按截止时间排序的堆
+
+    每个任务允许在 [due - slack, due + slack] 内执行（slack 为间隔的一个比例）。
+    线程睡到最早的截止时间，醒来后把所有已进入允许窗口的任务一起执行，
+    间隔相近的任务因此合并为一次唤醒；没有任务时线程完全阻塞。
+    """
+
+    def __init__(self, slack=0.1, clock=time.monotonic):
+        """
+        Args:
+            slack: 允许提前 / 推迟执行的时间占间隔的比例
+            clock: 时间函数
+        """
+        self.slack = slack
+        self.clock = clock
+        self._heap = []
+        self._tasks = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_every(self, interval, func, max_interval=None, name=None, delay=None):
+        """
+        注册周期任务
+
+        Args:
+            interval: 间隔（秒），也是自适应间隔的最小值
+            func: 无参数的可调用对象，返回真值表示有活动
+            max_interval: 空闲时放大到的最大间隔，None 表示固定间隔
+            name: 任务名（线程名、调试用）
+            delay: 首次执行前的等待时间，默认一个间隔
+
+        Returns:
+            PeriodicTask
+        """
+        task = PeriodicTask(self, func, interval, max_interval, name)
+        self._reschedule(task, self.clock() + (interval if delay is None else delay))
+        return task
+
+    def _reschedule(self, task, due):
+        with self._cond:
+            task.due = due
+            task._generation += 1
+            deadline = due + task.interval * self.slack
+            heapq.heappush(self._heap, (deadline, next(self._counter), task._generation, task))
+            self._tasks.add(task)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _pop_ready(self):
+        """
+        等待到最早的截止时间，取出所有已进入允许窗口的任务
+
+        Returns:
+            list[PeriodicTask]
+        """
+        with self._cond:
+            while True:
+                heap = self._heap
+                while heap and (heap[0][3].cancelled or heap[0][2] != heap[0][3]._generation):
+                    _, _, _, task = heapq.heappop(heap)
+                    if task.cancelled:
+                        self._tasks.discard(task)
+                if not heap:
+                    self._cond.wait()
+                    continue
+                wait = heap[0][0] - self.clock()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    if heap and heap[0][0] > self.clock():
+                        continue
+                break
+
+            _wakeups.inc()
+            now = self.clock()
+            ready = []
+            for deadline, _, generation, task in heap:
+                if (not task.cancelled and generation == task._generation
+                        and task.due - task.interval * self.slack <= now):
+                    ready.append(task)
+            for task in ready:
+                # 使堆中的旧条目失效，执行后重新加入
+                task._generation += 1
+            return ready
+
+    def _run(self):
+        while True:
+            for task in self._pop_ready():
+                if task.cancelled:
+                    continue
+                interval = task._run()
+                if task.cancelled:
+                    continue
+                # 按计划时间推进，不累积执行延迟；落后超过一个间隔时从当前时间重新计算
+                now = self.clock()
+                due = task.due + interval
+                self._reschedule(task, due if due > now else now + interval)
+
+    @property
+    def tasks(self):
+        with self._cond:
+            return [task for task in self._tasks if not task.cancelled]
+
+
+# 全局调度器（首次注册任务时启动线程）
+scheduler = Scheduler()
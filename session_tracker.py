@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from config_loader import config
+from line_matcher import CHANNEL_START
+
+
+# 一次完整的观看会话（时间为 epoch 秒）
+Session = namedtuple('Session', ['source', 'cid', 'channel_id', 'start', 'end', 'duration'])
+
+
+class SessionTracker:
+    """
+    观看会话统计 - 把通道开始 / 结束事件配对为会话，随事件流增量更新
+
+    内存中只保留：未结束的会话、最近 max_sessions 条已结束会话、
+    以及统计窗口内每小时一组的按设备计数（开始次数、结束次数、观看时长）和并发峰值。
+    线程安全：feed() 通常在监控线程调用，query() / export() 可在任意线程调用。
+    """
+
+    def __init__(self, window_hours=24, max_sessions=1000, open_ttl=None, clock=time.time):
+        """
+        Args:
+            window_hours: 滚动统计窗口（小时）
+            max_sessions: 保留的最近已结束会话条数
+            open_ttl: 未结束会话的最长保留时间（秒），默认 monitor.channel_ttl
+            clock: 事件没有日志时间戳时使用的时间函数（与日志时间混用会使时长失真，
+                   这类事件的数量见 query() 的 untimed_events）
+        """
+        self.window_hours = window_hours
+        self._open_ttl = open_ttl or config.get('monitor.channel_ttl', 43200)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._open = OrderedDict()                 # (source, cid, channel_id) -> 开始时间
+        self._recent = deque(maxlen=max_sessions)  # 最近结束的会话
+        self._hours = {}                           # 小时序号 -> {'peak': 并发峰值, 'devices': {cid: [开始, 结束, 观看秒数]}}
+        self._latest = 0.0                         # 已处理事件的最新时间
+        self._untimed = 0                          # 没有日志时间戳的事件数
+
+    def _bucket(self, when):
+        hour = int(when // 3600)
+        bucket = self._hours.get(hour)
+        if bucket is None:
+            bucket = self._hours[hour] = {'peak': 0, 'devices': {}}
+            # 新的小时出现时淘汰窗口外的旧小时（窗口外的事件写入后立即被丢弃）
+            newest = max(self._hours)
+            for old in [h for h in self._hours if h <= newest - self.window_hours]:
+                del self._hours[old]
+        return bucket
+
+    def _count(self, cid, when, index, amount=1):
+        counts = self._bucket(when)['devices'].setdefault(cid, [0, 0, 0.0])
+        counts[index] += amount
+
+    def _expire_open(self):
+        """超过 open_ttl 仍未结束的会话（漏掉了结束行）直接丢弃"""
+        limit = self._latest - self._open_ttl
+        while self._open:
+            key, start = next(iter(self._open.items()))
+            if start >= limit:
+                break
+            del self._open[key]
+
+    def feed(self, events):
+        """
+        处理一批通道事件（LogMonitor.poll() / MonitorEngine 交付的状态变化事件）
+
+        Returns:
+            list[Session]: 本批结束的会话
+        """
+        finished = []
+        with self._lock:
+            now = None
+            for event in events:
+                when = event.time
+                if when is None:
+                    when = now = now or self._clock()
+                    self._untimed += 1
+                self._latest = max(self._latest, when)
+                key = (event.source, event.cid, event.channel_id)
+
+                if event.kind == CHANNEL_START:
+                    self._open.pop(key, None)
+                    self._open[key] = when
+                    self._count(event.cid, when, 0)
+                    bucket = self._bucket(when)
+                    bucket['peak'] = max(bucket['peak'], len(self._open))
+                    continue
+
+                start = self._open.pop(key, None)
+                if start is None:
+                    # 开始于监控启动之前（或已过期），无法计算时长
+                    continue
+                duration = max(0.0, when - start)
+                session = Session(event.source, event.cid, event.channel_id, start, when, duration)
+                self._recent.append(session)
+                self._count(event.cid, when, 1)
+                self._count(event.cid, when, 2, duration)
+                finished.append(session)
+            self._expire_open()
+        return finished
+
+    def sessions(self, cid=None, limit=None):
+        """最近结束的会话（新的在后），可按设备过滤"""
+        with self._lock:
+            result = [s for s in self._recent if cid is None or s.cid == cid]
+        return result[-limit:] if limit else result
+
+    def query(self, cid=None):
+        """
+        查询统计窗口内的汇总
+
+        Args:
+            cid: 只统计指定设备，默认全部
+
+        Returns:
+            dict: open（当前观看数）、peak_concurrent（窗口内并发峰值）、
+                  devices（按设备汇总）、hours（每小时各设备的开始次数与并发峰值）、
+                  untimed_events（没有日志时间戳、按发现时间计时的事件数）
+        """
+        with self._lock:
+            devices = {}
+            hours = []
+            for hour in sorted(self._hours):
+                bucket = self._hours[hour]
+                per_device = {}
+                for device, (started, ended, seconds) in bucket['devices'].items():
+                    if cid is not None and device != cid:
+                        continue
+                    if started:
+                        per_device[device] = started
+                    total = devices.setdefault(device, {'sessions': 0, 'completed': 0, 'watch_seconds': 0.0})
+                    total['sessions'] += started
+                    total['completed'] += ended
+                    total['watch_seconds'] += seconds
+                hours.append({
+                    'hour': datetime.fromtimestamp(hour * 3600).isoformat(timespec='minutes'),
+                    'sessions': sum(per_device.values()),
+                    'peak_concurrent': bucket['peak'],
+                    'devices': per_device,
+                })
+
+            open_counts = {}
+            for _, device, _ in self._open:
+                if cid is None or device == cid:
+                    open_counts[device] = open_counts.get(device, 0) + 1
+            for device, total in devices.items():
+                total['open'] = open_counts.get(device, 0)
+                total['avg_seconds'] = (total['watch_seconds'] / total['completed']
+                                        if total['completed'] else 0.0)
+
+            return {
+                'window_hours': self.window_hours,
+                'open': sum(open_counts.values()),
+                'peak_concurrent': max((b['peak'] for b in self._hours.values()), default=0),
+                'devices': devices,
+                'hours': hours,
+                'untimed_events': self._untimed,
+            }
+
+    def export(self, path, recent=100):
+        """原子写入统计汇总 JSON（临时文件 + 替换）"""
+        data = self.query()
+        data['generated'] = time.time()
+        data['recent_sessions'] = [s._asdict() for s in self.sessions(limit=recent)]
+
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError:
+            return False
+        return True
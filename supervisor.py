@@ -0,0 +1,167 @@
+import time
+import threading
+
+from config_loader import config
+from process_manager import ProcessManager
+from log_finder import LogFinder
+from scheduler import scheduler
+
+
+class ProcessSupervisor:
+    """
+    目标进程生命周期监督 - 状态机
+
+    WAITING -> RESOLVING -> MONITORING -> WAITING ...
+    进程退出时通过 on_exit 通知暂停监控；重新启动后重新查找最新日志，
+    通过 on_start(pid, log_path) 通知恢复监控。回调在监督线程中执行。
+    """
+
+    WAITING = 'waiting'        # 等待进程启动
+    RESOLVING = 'resolving'    # 进程已启动，查找日志
+    MONITORING = 'monitoring'  # 监控中，等待进程退出
+    STOPPED = 'stopped'
+
+    def __init__(self, process_name=None, log_dir=None, on_start=None, on_exit=None, finder=None):
+        """
+        Args:
+            process_name: 进程名，默认从配置读取
+            log_dir: 日志目录，默认从配置读取
+            on_start: 回调 (pid, log_path)
+            on_exit: 回调 ()
+            finder: 日志查找器，默认 LogFinder()
+        """
+        self.process_name = process_name or config.get('process.name')
+        self.log_dir = log_dir
+        self.state = self.WAITING
+        self.pid = None
+        self.log_path = None
+        self._on_start = on_start
+        self._on_exit = on_exit
+        self._finder = finder or LogFinder()
+        self._start_watcher = None
+        self._resolve_at = 0
+        self._stop = threading.Event()
+
+    def attach(self, pid, log_path):
+        """以已知的进程和日志直接进入监控状态（启动时已完成等待和查找）"""
+        self.pid = pid
+        self.log_path = log_path
+        self.state = self.MONITORING
+
+    def _wait_for_process(self, timeout):
+        pid = ProcessManager.find_pid(self.process_name)
+        if pid is not None or timeout <= 0:
+            return pid
+
+        if self._start_watcher is None:
+            self._start_watcher = ProcessManager.create_start_watcher(self.process_name) or False
+        if self._start_watcher:
+            return self._start_watcher.wait(timeout)
+
+        self._stop.wait(timeout)
+        return None
+
+    def step(self, block=True):
+        """
+        执行一次状态转移
+
+        Args:
+            block: True 时至多阻塞一个等待间隔；False 时只做一次非阻塞检查
+        """
+        interval = config.get('process.wait_interval', 2)
+
+        if self.state == self.WAITING:
+            pid = self._wait_for_process(interval if block else 0)
+            if pid is None:
+                return
+            self.pid = pid
+            self._resolve_at = time.monotonic() + config.get('process.init_delay', 1)
+            self.state = self.RESOLVING
+
+        elif self.state == self.RESOLVING:
+            delay = self._resolve_at - time.monotonic()
+            if delay > 0:
+                if block:
+                    self._stop.wait(delay)
+                return
+            if not ProcessManager.is_alive(self.pid):
+                self.pid = None
+                self.state = self.WAITING
+                return
+            # 找不到新日志时沿用上一次的日志（例如手动输入的路径）
+            log_path = self._finder.find_with_fallback(self.log_dir) or self.log_path
+            if not log_path:
+                if block:
+                    self._stop.wait(config.get('monitor.file_wait_interval', 3))
+                return
+            self.log_path = log_path
+            self.state = self.MONITORING
+            if self._on_start:
+                self._on_start(self.pid, log_path)
+
+        elif self.state == self.MONITORING:
+            if ProcessManager.wait_for_exit(self.pid, interval if block else 0):
+                self.pid = None
+                self.state = self.WAITING
+                if self._on_exit:
+                    self._on_exit()
+
+    def run(self):
+        """阻塞运行状态机，直到 stop()"""
+        while not self._stop.is_set():
+            self.step()
+        self.state = self.STOPPED
+
+    def stop(self):
+        self._stop.set()
+
+
+class SupervisorGroup:
+    """
+    在一个线程内监督多个监控源的目标进程
+
+    只有一个监控源时使用阻塞等待；多个时由调度器按 process.wait_interval 做非阻塞检查
+    """
+
+    def __init__(self, sources, on_start=None, on_exit=None):
+        """
+        Args:
+            sources: 监控源配置列表（load_sources() 的结果）
+            on_start: 回调 (source_name, pid, log_path)
+            on_exit: 回调 (source_name)
+        """
+        self.supervisors = {}
+        for source in sources:
+            name = source['name']
+            self.supervisors[name] = ProcessSupervisor(
+                source['process'], source['log_dir'],
+                on_start=self._bind(on_start, name),
+                on_exit=self._bind(on_exit, name),
+                finder=LogFinder(source['pattern'], source['backup_paths']))
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _bind(callback, name):
+        if callback is None:
+            return None
+        return lambda *args: callback(name, *args)
+
+    def run(self):
+        """阻塞运行，直到 stop()"""
+        supervisors = list(self.supervisors.values())
+        if len(supervisors) == 1:
+            supervisors[0].run()
+            return
+
+        interval = config.get('process.wait_interval', 2)
+        tasks = [scheduler.call_every(interval, lambda s=supervisor: s.step(block=False),
+                                      name=f"supervisor-{name}", delay=0)
+                 for name, supervisor in self.supervisors.items()]
+        self._stop.wait()
+        for task in tasks:
+            task.cancel()
+
+    def stop(self):
+        self._stop.set()
+        for supervisor in self.supervisors.values():
+            supervisor.stop()
@@ -5,27 +5,50 @@ from collections import deque
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QVBoxLayout, QHBoxLayout, 
-    QGraphicsDropShadowEffect, QDesktopWidget
+    QGraphicsDropShadowEffect
 )
 from PyQt5.QtCore import (
-    Qt, QTimer, QPoint, QPropertyAnimation, QEasingCurve, 
+    Qt, QTimer, QPoint, QPropertyAnimation, QParallelAnimationGroup, QEasingCurve, 
     pyqtSignal, QObject, QThread
 )
 from PyQt5.QtGui import QColor
 
+from config_loader import config
+from channel_store import ChannelStore
+from metrics import metrics
+
+
+_shown = metrics.counter('toasts_shown_total', "显示的弹窗数")
+_evicted = metrics.counter('toasts_evicted_total', "超过 MAX_TOASTS 被提前关闭的弹窗数")
+_merged = metrics.counter('toasts_merged_total', "超过 MAX_TOASTS 合并进汇总弹窗的通知数")
+_suppressed = metrics.counter('toasts_suppressed_total', "冷却时间内被忽略的通知数")
+
+
+def _cooldown_limits(cfg):
+    """
+    冷却记录的有效期和容量：monitor.channel_ttl / channel_max，
+    有效期不短于 notification_cooldown，否则冷却未结束的记录会被提前淘汰
+
+    Returns:
+        (ttl, max_size)
+    """
+    ttl = max(cfg.get('monitor.channel_ttl', 43200) or 0, cfg.get('monitor.notification_cooldown', 3))
+    return ttl, cfg.get('monitor.channel_max', 10000)
+
 
 class ToastWindow(QWidget):
-    """单个通知窗口"""
+    """单个通知窗口（由 ToastManager 的窗口池复用）"""
     
     closed = pyqtSignal(object)  # 发送自身引用
     
-    def __init__(self, title, message, duration=5000):
+    def __init__(self, title="", message="", duration=5000):
         super().__init__()
         
         self.duration = duration
         self.dragging = False
         self.drag_position = QPoint()
         self.target_y = 0
+        self.offscreen_x = 0  # 滑入起点 / 滑出终点（屏幕右侧外），由 ToastManager 设置
         
         self._setup_window()
         self._setup_ui(title, message)
@@ -91,7 +114,7 @@ class ToastWindow(QWidget):
         text_layout.setSpacing(4)
         text_layout.setContentsMargins(0, 0, 0, 0)
         
-        title_label = QLabel(title)
+        self.title_label = title_label = QLabel(title)
         title_label.setStyleSheet("""
             QLabel {
                 color: #FFFFFF;
@@ -103,7 +126,7 @@ class ToastWindow(QWidget):
         title_label.setWordWrap(True)
         text_layout.addWidget(title_label)
         
-        msg_label = QLabel(message)
+        self.msg_label = msg_label = QLabel(message)
         msg_label.setStyleSheet("""
             QLabel {
                 color: #CCCCCC;
@@ -126,12 +149,27 @@ class ToastWindow(QWidget):
         self.hide_animation.setEasingCurve(QEasingCurve.InCubic)
         self.hide_animation.finished.connect(self._do_close)
         
-    def show_at(self, x, y):
-        """在指定位置显示（带滑入动画）"""
+    def set_content(self, title, message, duration=5000):
+        """更换通知内容（复用窗口时调用）"""
+        self.title_label.setText(title)
+        self.msg_label.setText(message)
+        self.duration = duration
+        
+    def recycle(self):
+        """停止计时和动画并隐藏，等待下次复用"""
+        self.close_timer.stop()
+        self.show_animation.stop()
+        self.hide_animation.stop()
+        self._paused = False
+        self.dragging = False
+        self.hide()
+        
+    def show_at(self, x, y, offscreen_x):
+        """在指定位置显示（从屏幕右侧外 offscreen_x 处滑入）"""
         self.target_y = y
+        self.offscreen_x = offscreen_x
         
-        # 从屏幕右侧外滑入
-        start_x = QDesktopWidget().availableGeometry().width() + 50
+        start_x = offscreen_x
         self.move(start_x, y)
         
         end_pos = QPoint(x, y)
@@ -144,35 +182,39 @@ class ToastWindow(QWidget):
         self.show_animation.start()
         self.close_timer.start(self.duration)
         
-    def move_to(self, y, animate=True):
-        """移动到新的Y坐标"""
-        self.target_y = y
-        if animate:
-            anim = QPropertyAnimation(self, b"pos")
-            anim.setDuration(200)
-            anim.setEasingCurve(QEasingCurve.OutCubic)
-            anim.setStartValue(self.pos())
-            anim.setEndValue(QPoint(self.x(), y))
-            anim.start()
-        else:
-            self.move(self.x(), y)
-            
+    def is_sliding_in(self):
+        return self.show_animation.state() == QPropertyAnimation.Running
+        
+    def is_sliding_out(self):
+        return self.hide_animation.state() == QPropertyAnimation.Running
+        
+    def retarget(self, pos):
+        """滑入过程中目标位置变化：从当前位置继续滑向新位置"""
+        self.target_y = pos.y()
+        self.show_animation.stop()
+        self.show_animation.setStartValue(self.pos())
+        self.show_animation.setEndValue(pos)
+        self.show_animation.start()
+        
     def _start_hide_animation(self):
         """开始滑出"""
         if self._paused:
             return
             
-        screen_width = QDesktopWidget().availableGeometry().width()
-        end_pos = QPoint(screen_width + 50, self.y())
+        end_pos = QPoint(self.offscreen_x, self.y())
         
         self.hide_animation.setStartValue(self.pos())
         self.hide_animation.setEndValue(end_pos)
         self.hide_animation.start()
         
     def _do_close(self):
-        """真正关闭"""
+        """滑出结束：交还给管理器"""
+        self.closed.emit(self)
+        
+    def closeEvent(self, event):
+        """被外部关闭时同样交还给管理器，窗口只隐藏不销毁"""
+        event.ignore()
         self.closed.emit(self)
-        self.close()
         
     def enterEvent(self, event):
         """鼠标进入暂停"""
@@ -211,6 +253,10 @@ class ToastManager(QObject):
     
     # 信号：请求显示通知 (title, message, channel_id, duration, cooldown)
     show_signal = pyqtSignal(str, str, str, int, int)
+    # 信号：请求批量显示通知 ([(title, message, channel_id), ...], duration, cooldown)
+    show_batch_signal = pyqtSignal(list, int, int)
+    # 信号：配置重新加载后修改冷却记录的限制 (ttl, max_size)
+    limits_signal = pyqtSignal(float, int)
     
     def __init__(self):
         super().__init__()
@@ -221,16 +267,37 @@ class ToastManager(QObject):
         self.MAX_TOASTS = 5
         
         self._toasts = deque()  # 通知队列，新的在左侧（底部）
-        self._last_time = {}
-        self._screen = QDesktopWidget().availableGeometry()
+        self._last_time = ChannelStore(*_cooldown_limits(config))  # 各设备最近一次通知时间
+        
+        # 缓存可用区域，只在屏幕变化时重新获取
+        self._desktop = QApplication.desktop()
+        self._screen = self._desktop.availableGeometry()
+        self._desktop.workAreaResized.connect(self._on_screen_changed)
+        self._desktop.resized.connect(self._on_screen_changed)
+        self._desktop.screenCountChanged.connect(self._on_screen_changed)
+        self._desktop.primaryScreenChanged.connect(self._on_screen_changed)
+        
+        # 每次重新布局只运行一个并行动画组，动画对象归动画组所有
+        self._layout_animation = QParallelAnimationGroup(self)
+        
+        # 窗口池：预先创建 MAX_TOASTS 个窗口，显示时更换内容，关闭时放回
+        self._pool = [self._create_window() for _ in range(self.MAX_TOASTS)]
         
         # 连接信号
         self.show_signal.connect(self._on_show_notification)
+        self.show_batch_signal.connect(self._on_show_batch)
+        self.limits_signal.connect(self._on_limits)
         
-        # 定时清理
-        self._cleanup_timer = QTimer(self)
-        self._cleanup_timer.timeout.connect(self._cleanup_closed)
-        self._cleanup_timer.start(500)  # 每500ms清理一次
+        # 配置重新加载在其他线程中通知，通过信号转到主线程
+        config.subscribe(self._on_config)
+        
+    def _create_window(self):
+        toast = ToastWindow()
+        toast.closed.connect(self._release)
+        # 提前解析样式表并创建原生窗口，避免首次显示时卡顿
+        toast.ensurePolished()
+        toast.winId()
+        return toast
         
     def _calculate_positions(self):
         """计算所有通知的位置（从底部向上堆叠）"""
@@ -244,49 +311,124 @@ class ToastManager(QObject):
             positions.append((x, y))
         return positions
         
+    @property
+    def _offscreen_x(self):
+        return self._screen.width() + 50
+        
+    def _on_screen_changed(self, *args):
+        """屏幕分辨率、任务栏或显示器数量变化：更新缓存并立即重新布局"""
+        self._screen = self._desktop.availableGeometry()
+        self._rearrange_toasts(animate=False)
+        
     def _rearrange_toasts(self, animate=True):
-        """重新排列所有通知位置"""
-        positions = self._calculate_positions()
-        for i, toast in enumerate(self._toasts):
-            if i < len(positions):
-                x, y = positions[i]
-                # 如果正在拖拽，不强制移动
-                if not toast.dragging:
-                    # 只有位置变化较大时才移动
-                    if abs(toast.y() - y) > 5:
-                        toast.move_to(y, animate=animate)
+        """
+        重新排列所有通知位置（只在通知增加、关闭和屏幕变化时调用）
+        
+        上一次布局的动画先停止并释放，本次需要移动的通知放入同一个动画组
+        """
+        group = self._layout_animation
+        group.stop()
+        group.clear()
+        
+        offscreen_x = self._offscreen_x
+        for toast, (x, y) in zip(self._toasts, self._calculate_positions()):
+            toast.offscreen_x = offscreen_x
+            # 正在拖拽或滑出时不强制移动
+            if toast.dragging or toast.is_sliding_out():
+                continue
+            target = QPoint(x, y)
+            if toast.is_sliding_in():
+                if toast.show_animation.endValue() != target:
+                    toast.retarget(target)
+                continue
+            # 只有位置变化较大时才移动
+            if (toast.pos() - target).manhattanLength() <= 5:
+                continue
+            toast.target_y = y
+            if animate:
+                anim = QPropertyAnimation(toast, b"pos")
+                anim.setDuration(200)
+                anim.setEasingCurve(QEasingCurve.OutCubic)
+                anim.setStartValue(toast.pos())
+                anim.setEndValue(target)
+                group.addAnimation(anim)
+            else:
+                toast.move(target)
+                
+        if group.animationCount():
+            group.start()
                         
-    def _cleanup_closed(self):
-        """清理已关闭的通知"""
-        closed = [t for t in self._toasts if not t.isVisible()]
-        if closed:
-            for t in closed:
-                self._toasts.remove(t)
-            self._rearrange_toasts(animate=True)
-            
-    def _remove_toast(self, toast):
-        """移除指定通知"""
+    def _release(self, toast):
+        """通知关闭：放回窗口池并重新排列剩余通知"""
         if toast in self._toasts:
             self._toasts.remove(toast)
+            toast.recycle()
+            self._pool.append(toast)
             self._rearrange_toasts(animate=True)
             
+    def _on_config(self, snapshot):
+        ttl, max_size = _cooldown_limits(snapshot)
+        self.limits_signal.emit(ttl, max_size or 0)
+        
+    def _on_limits(self, ttl, max_size):
+        self._last_time.set_limits(ttl, max_size)
+        
+    def _check_cooldown(self, channel_id, cooldown):
+        """冷却检查，通过时记录本次时间"""
+        store = self._last_time
+        if store.ttl is not None and store.ttl < cooldown:
+            # 调用方给出的冷却时间比有效期更长
+            store.set_limits(cooldown, store.max_size)
+        now = time.monotonic()
+        last = self._last_time.get(channel_id)
+        if last is not None and now - last < cooldown:
+            _suppressed.inc()
+            return False
+        self._last_time.add(channel_id, now)
+        return True
+        
     def _on_show_notification(self, title, message, channel_id, duration, cooldown):
         """处理显示通知请求（在主线程执行）"""
-        # 冷却检查
-        now = time.time()
-        if channel_id in self._last_time:
-            if now - self._last_time[channel_id] < cooldown:
-                return
-        self._last_time[channel_id] = now
-        
-        # 限制数量
+        if not self._check_cooldown(channel_id, cooldown):
+            return
+        self._add_toast(title, message, duration)
+        
+    def _on_show_batch(self, items, duration, cooldown):
+        """
+        处理批量通知请求（在主线程执行）
+        
+        每批最多创建 MAX_TOASTS 个窗口，超出部分合并为一条汇总通知
+        """
+        items = [item for item in items if self._check_cooldown(item[2], cooldown)]
+        if not items:
+            return
+        
+        if len(items) > self.MAX_TOASTS:
+            shown = items[:self.MAX_TOASTS - 1]
+            overflow = len(items) - len(shown)
+            _merged.inc(overflow)
+            summary = (items[len(shown)][0], f"另有 {overflow} 台设备")
+        else:
+            shown = items
+            summary = None
+        
+        for title, message, _ in shown:
+            self._add_toast(title, message, duration)
+        if summary:
+            self._add_toast(summary[0], summary[1], duration)
+            
+    def _add_toast(self, title, message, duration):
+        """从窗口池取出窗口并显示一条通知"""
+        # 限制数量：最旧的（最上面）直接放回窗口池
         while len(self._toasts) >= self.MAX_TOASTS:
-            oldest = self._toasts.pop()  # 移除最旧的（最上面）
-            oldest.close()
+            oldest = self._toasts.pop()
+            oldest.recycle()
+            _evicted.inc()
+            self._pool.append(oldest)
             
-        # 创建新通知
-        toast = ToastWindow(title, message, duration)
-        toast.closed.connect(lambda: self._remove_toast(toast))
+        toast = self._pool.pop() if self._pool else self._create_window()
+        toast.set_content(title, message, duration)
+        _shown.inc()
         
         # 添加到队列（新的在索引0，即最底部）
         self._toasts.appendleft(toast)
@@ -295,7 +437,7 @@ class ToastManager(QObject):
         positions = self._calculate_positions()
         if positions:
             x, y = positions[0]
-            toast.show_at(x, y)
+            toast.show_at(x, y, self._offscreen_x)
             
         # 重新排列其他通知（向上移动）
         if len(self._toasts) > 1:
@@ -358,6 +500,23 @@ class ToastNotifier:
         )
         return True
         
+    def show_batch(self, items, duration=5000, cooldown=3):
+        """
+        批量显示通知（线程安全）
+        
+        Args:
+            items: [(title, message, channel_id), ...]
+        """
+        try:
+            self._ensure_initialized()
+        except RuntimeError as e:
+            return False
+
+        ToastNotifier._manager.show_batch_signal.emit(
+            [tuple(item) for item in items], duration, cooldown
+        )
+        return True
+        
     def run(self):
         """启动事件循环（阻塞）"""
         if ToastNotifier._app: